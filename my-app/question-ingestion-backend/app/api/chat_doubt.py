@@ -1,18 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 from dotenv import load_dotenv
+import asyncio
 import json
+import time
+import weakref
 
 # LangChain imports
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_core.documents import Document
 from supabase.client import create_client
 from langchain_community.vectorstores import SupabaseVectorStore
 
+from app.services.answer_cache import CachedAnswer, SemanticAnswerCache
+from app.services.context import PackedContext, pack_context
+from app.services.corpora import CorpusRegistry
+from app.services.embeddings import embedding_batcher_stats, embedding_cache_stats, get_embeddings
+from app.services.faiss_store import FAISS_INDEX_DIR, exam_index_dir, load_faiss_index, load_or_build_faiss_index
+from app.services.health import VectorStoreHealth
+from app.services.metrics import LatencyRecorder, StageTimer
+from app.services.retrieval import batch_hybrid_search, hybrid_search
+from app.services.sessions import Conversation, Turn, create_session_store
+from app.services.single_flight import SingleFlight, query_key
+from app.services.vector_store import VectorStoreManager, load_docstore_documents
+from app.utils.hashing import chunk_id
+from app.utils.tokens import truncate_tokens
+
 # Load environment variables
 load_dotenv()
 
@@ -23,47 +40,100 @@ if not OPENAI_API_KEY:
 
 router = APIRouter()
 
-# Define request model
+# LLM calls in flight per /chat/doubt/batch request, and the most queries one batch may contain
+DOUBT_BATCH_CONCURRENCY = int(os.getenv("DOUBT_BATCH_CONCURRENCY", "8"))
+DOUBT_BATCH_MAX_QUERIES = int(os.getenv("DOUBT_BATCH_MAX_QUERIES", "200"))
+# Return per-stage timings in a Server-Timing response header
+DOUBT_SERVER_TIMING = os.getenv("DOUBT_SERVER_TIMING", "false").lower() == "true"
+
+def parse_exams(value: str) -> Dict[str, str]:
+    """"ssc_cgl,ibps_po:IBPS PO" -> {exam id: name used in the prompt}; the name defaults to the upper-cased id"""
+    exams = {}
+    for entry in value.split(","):
+        exam, _, name = entry.strip().partition(":")
+        if exam:
+            exams[exam] = name.strip() or exam.replace("_", " ").upper()
+    return exams
+
+# Conversations keep this many recent turns verbatim; older ones are folded into a rolling summary
+SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", "4"))
+# Token caps on the summary and on each remembered question and answer, which bound the prompt
+SESSION_SUMMARY_MAX_TOKENS = int(os.getenv("SESSION_SUMMARY_MAX_TOKENS", "300"))
+SESSION_TURN_MAX_TOKENS = int(os.getenv("SESSION_TURN_MAX_TOKENS", "300"))
+# Model that rewrites follow-ups as standalone queries and updates summaries
+DOUBT_CONDENSE_MODEL = os.getenv("DOUBT_CONDENSE_MODEL", "gpt-4o-mini")
+
+# Exams doubts can be asked about, each answered from its own corpus; the first is the default
+EXAMS = parse_exams(os.getenv("EXAMS", "ssc_cgl"))
+DEFAULT_EXAM = next(iter(EXAMS))
+
+# Restricts retrieval to chunks whose metadata has these values; exam also picks the corpus
+class DoubtFilters(BaseModel):
+    topic: Optional[str] = None
+    source: Optional[str] = None
+    exam: Optional[str] = None
+
+# Define request model; requests with the same session_id (chosen by the client) form a conversation
 class DoubtRequest(BaseModel):
     query: str
+    filters: Optional[DoubtFilters] = None
+    session_id: Optional[str] = None
 
-# Define response model
+# Define response model; standalone_query is what a follow-up was searched as
 class DoubtResponse(BaseModel):
     answer: str
+    cached: bool = False
+    session_id: Optional[str] = None
+    standalone_query: Optional[str] = None
+
+# Batch request: many queries sharing the same filters
+class DoubtBatchRequest(BaseModel):
+    queries: List[str]
+    filters: Optional[DoubtFilters] = None
+
+# One result per query, in request order; failed items carry an error instead of an answer
+class DoubtBatchItem(BaseModel):
+    query: str
+    answer: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+class DoubtBatchResponse(BaseModel):
+    results: List[DoubtBatchItem]
 
 # Dummy document chunks for SSC CGL exam
 SSC_CGL_CHUNKS = [
     Document(
         page_content="The Staff Selection Commission - Combined Graduate Level (SSC CGL) exam is conducted for recruitment to various Group B and Group C posts. The exam consists of four tiers: Tier I (Computer Based Examination), Tier II (Computer Based Examination), Tier III (Pen and Paper Mode), and Tier IV (Computer Proficiency Test/ Data Entry Skill Test).",
-        metadata={"source": "SSC CGL Overview", "topic": "exam_structure"}
+        metadata={"source": "SSC CGL Overview", "topic": "exam_structure", "exam": "ssc_cgl"}
     ),
     Document(
         page_content="Tier I of SSC CGL includes sections on General Intelligence and Reasoning, General Awareness, Quantitative Aptitude, and English Comprehension. Each section has 25 questions worth 50 marks, making a total of 100 questions worth 200 marks. The time duration is 60 minutes.",
-        metadata={"source": "SSC CGL Syllabus", "topic": "tier_i_syllabus"}
+        metadata={"source": "SSC CGL Syllabus", "topic": "tier_i_syllabus", "exam": "ssc_cgl"}
     ),
     Document(
         page_content="Tier II of SSC CGL includes papers on Quantitative Abilities, English Language and Comprehension, Statistics, and General Studies (Finance & Economics). Papers I and II are compulsory for all posts, while Papers III and IV are for specific posts. Each paper has 100 questions worth 200 marks.",
-        metadata={"source": "SSC CGL Syllabus", "topic": "tier_ii_syllabus"}
+        metadata={"source": "SSC CGL Syllabus", "topic": "tier_ii_syllabus", "exam": "ssc_cgl"}
     ),
     Document(
         page_content="For Quantitative Aptitude in SSC CGL, important topics include: Number Systems, Percentage, Ratio & Proportion, Average, Interest, Profit and Loss, Discount, Mixture and Alligation, Time and Work, Time and Distance, Mensuration, Algebra, Geometry and Trigonometry, Data Interpretation.",
-        metadata={"source": "SSC CGL Preparation Guide", "topic": "quant_topics"}
+        metadata={"source": "SSC CGL Preparation Guide", "topic": "quant_topics", "exam": "ssc_cgl"}
     ),
     Document(
         page_content="For General Intelligence and Reasoning in SSC CGL, focus on: Analogies, Similarities and Differences, Spatial Visualization, Spatial Orientation, Visual Memory, Discrimination, Observation, Relationship Concepts, Arithmetical Reasoning, Verbal and Figure Classification, Arithmetical Number Series, Non-verbal Series, Coding and Decoding, Statement Conclusion, Syllogistic Reasoning.",
-        metadata={"source": "SSC CGL Preparation Guide", "topic": "reasoning_topics"}
+        metadata={"source": "SSC CGL Preparation Guide", "topic": "reasoning_topics", "exam": "ssc_cgl"}
     ),
     Document(
         page_content="The English Comprehension section in SSC CGL tests: Reading Comprehension, Cloze Test, Para Jumbles, Sentence Correction, Fill in the Blanks, Synonyms, Antonyms, Spelling/Detecting Misspelled Words, Idioms & Phrases, One Word Substitution, Improvement of Sentences, Active/Passive Voice, Direct/Indirect Narration.",
-        metadata={"source": "SSC CGL Preparation Guide", "topic": "english_topics"}
+        metadata={"source": "SSC CGL Preparation Guide", "topic": "english_topics", "exam": "ssc_cgl"}
     ),
     Document(
         page_content="General Awareness for SSC CGL covers: Current Affairs, India and its neighboring countries, Sports, History, Culture, Geography, Economic Scene, General Polity, Indian Constitution, and Scientific Research. Focus on events of national and international importance that have occurred in the last 12 months.",
-        metadata={"source": "SSC CGL Preparation Guide", "topic": "ga_topics"}
+        metadata={"source": "SSC CGL Preparation Guide", "topic": "ga_topics", "exam": "ssc_cgl"}
     ),
     Document(
         page_content="The eligibility criteria for SSC CGL include: Candidates must be a citizen of India, Age limit varies from 18-32 years (with relaxation for reserved categories), Educational qualification: Bachelor's Degree from a recognized University or equivalent.",
-        metadata={"source": "SSC CGL Eligibility", "topic": "eligibility"}
+        metadata={"source": "SSC CGL Eligibility", "topic": "eligibility", "exam": "ssc_cgl"}
     ),
 ]
 
@@ -72,17 +142,48 @@ supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
 supabase = create_client(supabase_url, supabase_key)
 
-def get_vector_store():
-    """Get a vector store client with better error handling"""
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+def get_dummy_vector_store(embeddings, exam=DEFAULT_EXAM):
+    """FAISS index over the hardcoded chunks, persisted so it is only embedded when they change"""
+    chunks = [chunk for chunk in SSC_CGL_CHUNKS if chunk.metadata.get("exam") == exam]
+    if not chunks:
+        raise ValueError(f"No dummy data for exam {exam}; set USE_REAL_DATA=true and ingest its material")
+    return load_or_build_faiss_index(
+        documents=chunks,
+        embeddings=embeddings,
+        index_dir=os.path.join(FAISS_INDEX_DIR, f"{exam}_chunks")
+    )
+
+def faiss_index_dir(exam):
+    """Index written by scripts/ingest_documents.py --backend faiss --exam <exam>"""
+    index_dir = exam_index_dir(exam)
+    legacy_dir = os.path.join(FAISS_INDEX_DIR, "documents")
+    # Indexes ingested before corpora were per exam hold the default exam's material
+    if exam == DEFAULT_EXAM and not os.path.exists(index_dir) and os.path.exists(legacy_dir):
+        return legacy_dir
+    return index_dir
+
+def get_vector_store(exam=DEFAULT_EXAM):
+    """Get the vector store for one exam's corpus, with better error handling"""
+    embeddings = get_embeddings()
     
     # Check if we should use real data or dummy data
     use_real_data = os.getenv("USE_REAL_DATA", "false").lower() == "true"
     
-    if use_real_data:
+    if use_real_data and os.getenv("VECTOR_BACKEND", "supabase").lower() == "faiss":
+        # Offline alternative to Supabase: one index per exam
+        index_dir = faiss_index_dir(exam)
+        try:
+            print(f"Loading ingested FAISS index from {index_dir}...")
+            return load_faiss_index(index_dir, embeddings)
+        except Exception as e:
+            print(f"Error loading FAISS index: {str(e)}")
+            print("Falling back to dummy data")
+            return get_dummy_vector_store(embeddings, exam)
+    elif use_real_data:
         try:
             print("Attempting to use Supabase pgvector...")
-            # Use Supabase pgvector
+            # Use Supabase pgvector; exams share the documents table and are told apart by
+            # their exam metadata (see retrieval_filter)
             vector_store = SupabaseVectorStore(
                 client=supabase,
                 embedding=embeddings,
@@ -90,147 +191,789 @@ def get_vector_store():
                 query_name="match_documents"
             )
             
-            # Test if it works by checking document count
-            try:
-                result = supabase.table("documents").select("id", count="exact").execute()
-                doc_count = result.count if hasattr(result, 'count') else 0
-                print(f"Found {doc_count} documents in Supabase")
-                
-                if doc_count == 0:
-                    print("WARNING: No documents found in Supabase, falling back to dummy data")
-                    return FAISS.from_documents(documents=SSC_CGL_CHUNKS, embedding=embeddings)
-                
-            except Exception as e:
-                print(f"Error checking document count: {str(e)}")
+            # Fall back if the background health check found the table empty (None = not known yet)
+            doc_count = vector_store_health.document_count
+            print(f"Found {doc_count if doc_count is not None else 'an unknown number of'} documents in Supabase")
+            if doc_count == 0:
+                print("WARNING: No documents found in Supabase, falling back to dummy data")
+                return get_dummy_vector_store(embeddings, exam)
                 
             return vector_store
         except Exception as e:
             print(f"Error initializing Supabase vector store: {str(e)}")
             print("Falling back to dummy data")
-            return FAISS.from_documents(documents=SSC_CGL_CHUNKS, embedding=embeddings)
+            return get_dummy_vector_store(embeddings, exam)
     else:
         # Use dummy data with FAISS for development/testing
         print("WARNING: Using dummy data for development. Set USE_REAL_DATA=true to use Supabase.")
-        return FAISS.from_documents(documents=SSC_CGL_CHUNKS, embedding=embeddings)
+        return get_dummy_vector_store(embeddings, exam)
+
+def load_corpus_documents(vector_store, exam=DEFAULT_EXAM):
+    """Every chunk behind the exam's vector store, for the BM25 index; runs at build time, never per request"""
+    if isinstance(vector_store, SupabaseVectorStore):
+        documents = []
+        page_size = 1000
+        while True:
+            result = (
+                supabase.table("documents")
+                .select("content, metadata")
+                .contains("metadata", {"exam": exam})
+                .order("id")
+                .range(len(documents), len(documents) + page_size - 1)
+                .execute()
+            )
+            documents.extend(
+                Document(page_content=row["content"], metadata=row.get("metadata") or {})
+                for row in result.data
+            )
+            if len(result.data) < page_size:
+                break
+        print(f"Loaded {len(documents)} {exam} chunks from Supabase for the lexical index")
+        return documents
+    return load_docstore_documents(vector_store)
+
+def uses_supabase():
+    use_real_data = os.getenv("USE_REAL_DATA", "false").lower() == "true"
+    return use_real_data and os.getenv("VECTOR_BACKEND", "supabase").lower() != "faiss"
+
+def count_documents():
+    """
+    Document count for the health snapshot. Supabase is asked for an estimated
+    count (planner statistics for large tables), never an exact one.
+    """
+    if uses_supabase():
+        result = supabase.table("documents").select("id", count="estimated", head=True).execute()
+        return result.count
+    return corpora.chunk_count()
+
+def retrieval_filter(metadata_filter):
+    """
+    Filter passed to the vector store and BM25 index. Per-exam FAISS indexes only
+    hold their exam, so the exam is dropped there; pgvector needs it to scope the
+    shared documents table (rows ingested before exams existed are tagged by
+    app.scripts.backfill_exam_metadata).
+    """
+    if metadata_filter is None or uses_supabase():
+        return metadata_filter
+    return {key: value for key, value in metadata_filter.items() if key != "exam"} or None
+
+def create_corpus_manager(exam):
+    return VectorStoreManager(
+        lambda: get_vector_store(exam),
+        corpus_loader=lambda store: load_corpus_documents(store, exam)
+    )
+
+# One vector store per exam, loaded on first use and unloaded least recently used first
+# when over CORPUS_MEMORY_BUDGET_MB; the default exam is loaded at startup (see app/main.py)
+corpora = CorpusRegistry(create_corpus_manager)
+
+# Document count and retrieval health, refreshed in the background and read by requests
+vector_store_health = VectorStoreHealth(count_documents)
+
+# Answers to previous doubts, reused for near-identical queries
+answer_cache = SemanticAnswerCache()
+
+# Rolling per-stage latency histograms for doubt requests, reported by the diagnostic endpoint
+doubt_latency = LatencyRecorder()
+
+def finish_timing(timer: StageTimer, cached=False, retrieval_legs=None):
+    """Record a finished request's stage timings; cache hits are kept apart from generated answers"""
+    timer.record("total", timer.elapsed())
+    doubt_latency.observe(timer.timings, prefix="cached" if cached else None)
+    if retrieval_legs:
+        doubt_latency.observe(retrieval_legs, prefix="retrieval")
+
+# Concurrent identical doubts share one in-flight answer
+doubt_flights = SingleFlight()
+
+def cached_answer_validator(manager: VectorStoreManager):
+    """A cached answer stays valid while the chunks it was generated from are still in the exam's store"""
+    def is_valid(entry: CachedAnswer) -> bool:
+        if entry.generation == manager.generation:
+            return True
+        chunk_ids = manager.chunk_ids
+        return chunk_ids is not None and all(cid in chunk_ids for cid in entry.chunk_ids)
+    return is_valid
+
+def get_exam(filters: Optional[DoubtFilters]) -> str:
+    """The exam whose corpus answers the doubt"""
+    exam = filters.exam if filters and filters.exam else DEFAULT_EXAM
+    if exam not in EXAMS:
+        raise HTTPException(status_code=404, detail=f"Unknown exam {exam}; available: {', '.join(EXAMS)}")
+    return exam
+
+def get_metadata_filter(filters: Optional[DoubtFilters], exam: str = DEFAULT_EXAM) -> Dict[str, str]:
+    """Metadata values every retrieved chunk must have; always includes the exam"""
+    metadata_filter = {}
+    if filters is not None and filters.topic:
+        metadata_filter["topic"] = filters.topic
+    if filters is not None and filters.source:
+        metadata_filter["source"] = filters.source
+    metadata_filter["exam"] = exam
+    return metadata_filter
+
+def should_bypass_cache(cache_control: Optional[str], x_cache_bypass: Optional[str]) -> bool:
+    if x_cache_bypass and x_cache_bypass.lower() in ("1", "true", "yes"):
+        return True
+    return bool(cache_control) and "no-cache" in cache_control.lower()
 
 # Define the prompt template
-RAG_PROMPT_TEMPLATE = """You are an expert SSC CGL exam tutor. Use the following information from SSC CGL study materials to answer the student's question.
+RAG_PROMPT_TEMPLATE = """You are an expert {exam_name} exam tutor. Use the following information from {exam_name} study materials to answer the student's question.
 
 Context information:
 {context}
-
+{history}
 Student's question: {question}
 
 Please provide a detailed, accurate answer based on the context information. If the context doesn't contain enough information to answer the question completely, clearly state what information is missing and provide the best answer you can with the available information. Include relevant examples and explanations where appropriate.
 """
 
-# Create the chat prompt
-def get_prompt():
-    return ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE)
+# Create the chat prompt for one exam; history is only filled in for conversations
+def get_prompt(exam=DEFAULT_EXAM):
+    return ChatPromptTemplate.from_template(RAG_PROMPT_TEMPLATE).partial(
+        exam_name=EXAMS.get(exam, exam), history=""
+    )
+
+CONDENSE_PROMPT_TEMPLATE = """Below is a conversation between a student and an {exam_name} exam tutor, followed by the student's next question. Rewrite the next question as a standalone question that can be understood without the conversation, keeping every detail needed to search study material for the answer. Return only the question.
+
+{history}
+
+Next question: {question}
+
+Standalone question:"""
+
+SUMMARY_PROMPT_TEMPLATE = """Update the summary of a tutoring conversation about the {exam_name} exam with the turns below. Keep the topics discussed, facts established and anything the student is still unsure about, in at most {max_words} words. Return only the summary.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:"""
+
+def get_helper_llm():
+    return ChatOpenAI(model=DOUBT_CONDENSE_MODEL, temperature=0)
+
+def format_turns(turns):
+    return "\n\n".join(f"Student: {turn.question}\nTutor: {turn.answer}" for turn in turns)
+
+def format_history(conversation: Conversation) -> str:
+    """Summary plus the most recent turns, each capped, so the prompt stays bounded however long the conversation"""
+    parts = []
+    if conversation.summary:
+        parts.append(f"Summary of the earlier conversation: {conversation.summary}")
+    recent = conversation.turns[-SESSION_RECENT_TURNS:] if SESSION_RECENT_TURNS > 0 else []
+    if recent:
+        parts.append(format_turns(recent))
+    return "\n\n".join(parts)
+
+def prompt_history(history: str) -> str:
+    """The conversation section of the answer prompt"""
+    return f"\nConversation so far:\n{history}\n" if history else ""
+
+async def condense_query(history: str, query: str, exam: str) -> str:
+    """The follow-up rewritten as a standalone query for retrieval; the query itself if that fails"""
+    chain = PromptTemplate.from_template(CONDENSE_PROMPT_TEMPLATE) | get_helper_llm()
+    try:
+        result = await chain.ainvoke({"exam_name": EXAMS.get(exam, exam), "history": history, "question": query})
+    except Exception as e:
+        print(f"Error condensing follow-up, retrieving with it as asked: {str(e)}")
+        return query
+    return result.content.strip() or query
+
+# Sessions (conversation summary and recent turns), expired after SESSION_TTL_SECONDS of inactivity
+session_store = create_session_store()
+# Serializes updates to one conversation; locks disappear once no request holds them
+session_locks = weakref.WeakValueDictionary()
+# Summary updates run after the response; references are held until they finish
+background_tasks = set()
+
+def session_lock(session_id: str) -> asyncio.Lock:
+    lock = session_locks.get(session_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        session_locks[session_id] = lock
+    return lock
+
+async def load_conversation(session_id: str) -> Conversation:
+    return await session_store.get(session_id) or Conversation(session_id=session_id)
+
+async def record_turn(session_id: str, query: str, answer: str, exam: str):
+    """Append a turn and, once there are more than SESSION_RECENT_TURNS, fold the oldest into the summary"""
+    async with session_lock(session_id):
+        conversation = await load_conversation(session_id)
+        conversation.turns.append(Turn(
+            question=truncate_tokens(query, SESSION_TURN_MAX_TOKENS),
+            answer=truncate_tokens(answer, SESSION_TURN_MAX_TOKENS)
+        ))
+        conversation.turn_count += 1
+        await session_store.save(conversation)
+    if len(conversation.turns) > SESSION_RECENT_TURNS:
+        task = asyncio.create_task(summarize_conversation(session_id, exam))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+async def summarize_conversation(session_id: str, exam: str):
+    """Folds turns beyond the most recent SESSION_RECENT_TURNS into the rolling summary"""
+    async with session_lock(session_id):
+        conversation = await session_store.get(session_id)
+        if conversation is None:
+            return
+        overflow = len(conversation.turns) - SESSION_RECENT_TURNS
+        if overflow <= 0:
+            return
+        chain = PromptTemplate.from_template(SUMMARY_PROMPT_TEMPLATE) | get_helper_llm()
+        try:
+            result = await chain.ainvoke({
+                "exam_name": EXAMS.get(exam, exam),
+                # Roughly 3 words per 4 tokens
+                "max_words": SESSION_SUMMARY_MAX_TOKENS * 3 // 4,
+                "summary": conversation.summary or "(none yet)",
+                "turns": format_turns(conversation.turns[:overflow])
+            })
+        except Exception as e:
+            # The turns stay and are retried with the next one; prompts only ever use the most recent
+            print(f"Error summarizing conversation {session_id}: {str(e)}")
+            return
+        conversation.summary = truncate_tokens(result.content.strip(), SESSION_SUMMARY_MAX_TOKENS)
+        conversation.turns = conversation.turns[overflow:]
+        await session_store.save(conversation)
+
+def get_llm():
+    # stream_usage makes streamed responses report token usage in their last chunk
+    return ChatOpenAI(model="gpt-4-turbo", temperature=0.1, stream_usage=True)
+
+async def retrieve_documents(manager, query, query_embedding, metadata_filter=None):
+    """Top chunks for an already-embedded query, fusing vector and BM25 results when available"""
+    vector_store = await manager.get()
+    # Stores without a native async search run in the (bounded) default executor
+    start_time = time.perf_counter()
+    try:
+        result = await hybrid_search(
+            vector_store, manager.lexical_index, query, query_embedding,
+            metadata_filter=retrieval_filter(metadata_filter)
+        )
+    except Exception as e:
+        vector_store_health.record_retrieval(time.perf_counter() - start_time, error=e)
+        raise
+    vector_store_health.record_retrieval(time.perf_counter() - start_time)
+    retrieved_docs = result.documents
+    
+    # Print retrieved documents for debugging
+    leg_times = ", ".join(f"{leg} {seconds * 1000:.1f}ms" for leg, seconds in result.timings.items())
+    filter_note = f", filter {metadata_filter}" if metadata_filter else ""
+    print(f"\nRetrieved {len(retrieved_docs)} documents ({leg_times}{filter_note}):")
+    for i, doc in enumerate(retrieved_docs):
+        source = doc.metadata.get("source", "Unknown")
+        topic = doc.metadata.get("topic", "Unknown")
+        print(f"\nDocument {i+1} - {source} - {topic}")
+        print(f"Content: {doc.page_content[:100]}...")  # Print first 100 chars
+    
+    return result
+
+def build_context(retrieval) -> PackedContext:
+    """Pick the retrieved chunks that go into the prompt, within the context token budget"""
+    packed = pack_context(retrieval.documents, retrieval.similarities)
+    dropped = ", ".join(f"{count} {reason}" for reason, count in packed.dropped.items() if count)
+    print(f"\nPacked {len(packed.documents)} chunks into ~{packed.token_count} context tokens"
+          + (f" (dropped {dropped})" if dropped else ""))
+    return packed
+
+def format_context(retrieved_docs, texts=None):
+    """Format context from retrieved documents (texts overrides their content, e.g. with overlap removed)"""
+    context_texts = []
+    for i, doc in enumerate(retrieved_docs):
+        source = doc.metadata.get("source", "Unknown")
+        topic = doc.metadata.get("topic", "Unknown")
+        text = texts[i] if texts is not None else doc.page_content
+        context_texts.append(f"[Document {i+1} - {source} - {topic}]\n{text}")
+    
+    return "\n\n".join(context_texts)
+
+def describe_sources(retrieved_docs):
+    """Source metadata sent to streaming clients ahead of the answer"""
+    return [
+        {
+            "id": chunk_id(doc),
+            "source": doc.metadata.get("source", "Unknown"),
+            "topic": doc.metadata.get("topic", "Unknown"),
+            "preview": doc.page_content[:200]
+        }
+        for doc in retrieved_docs
+    ]
+
+def store_answer(manager, query, query_embedding, answer, retrieved_docs, metadata_filter=None):
+    answer_cache.store(
+        query_embedding,
+        query=query,
+        answer=answer,
+        chunk_ids=tuple(chunk_id(doc) for doc in retrieved_docs),
+        generation=manager.generation,
+        metadata_filter=metadata_filter
+    )
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def generate_doubt_answer(query, exam, metadata_filter, bypass_cache, history=""):
+    """
+    The /chat/doubt pipeline: condense (follow-ups only), embed, answer cache,
+    retrieval, context and LLM. Returns (answer, X-Cache value, stage timer,
+    standalone query or None).
+    
+    A follow-up in a conversation is searched as a standalone query and answered
+    with the conversation history in the prompt; its answer depends on that
+    history, so it neither comes from nor goes into the answer cache.
+    """
+    timer = StageTimer()
+    print(f"\n--- RAG Query ({exam}): {query} ---")
+    
+    # Get the exam's corpus (real or dummy), loading it on first use
+    with timer.stage("corpus"):
+        manager = await corpora.get(exam)
+    
+    standalone_query = None
+    if history:
+        with timer.stage("condense"):
+            standalone_query = await condense_query(history, query, exam)
+        print(f"\nSearching follow-up as: {standalone_query}")
+        bypass_cache = True
+    search_query = standalone_query or query
+    
+    # Embed the query once; it is used for both the answer cache and retrieval
+    with timer.stage("embed"):
+        query_embedding = await get_embeddings().aembed_query(search_query)
+    
+    if not bypass_cache:
+        with timer.stage("cache_lookup"):
+            cached = answer_cache.lookup(query_embedding, cached_answer_validator(manager), metadata_filter)
+        if cached:
+            entry, similarity = cached
+            print(f"\nServing cached answer (similarity {similarity:.3f} to: {entry.query})")
+            finish_timing(timer, cached=True)
+            return entry.answer, "HIT", timer, None
+    
+    # Retrieve relevant documents
+    with timer.stage("retrieval"):
+        retrieval = await retrieve_documents(manager, search_query, query_embedding, metadata_filter)
+    with timer.stage("context"):
+        packed = build_context(retrieval)
+        retrieved_docs = packed.documents
+        context = format_context(retrieved_docs, packed.texts)
+    
+    # Debug: Check if we're using real data or dummy data
+    using_supabase = os.getenv("USE_REAL_DATA", "false").lower() == "true"
+    print(f"\nUsing Supabase for retrieval: {using_supabase}")
+    
+    # Generate answer using OpenAI; streamed internally so time to first token is measurable
+    chain = get_prompt(exam) | get_llm()
+    parts = []
+    with timer.stage("llm_total"):
+        llm_start = time.perf_counter()
+        async for chunk in chain.astream({"context": context, "question": query, "history": prompt_history(history)}):
+            if chunk.content:
+                if not parts:
+                    timer.record("llm_first_token", time.perf_counter() - llm_start)
+                parts.append(chunk.content)
+    
+    # Extract the answer from the response
+    answer = "".join(parts)
+    print(f"\nGenerated answer (first 100 chars): {answer[:100]}...")
+    
+    if not history:
+        store_answer(manager, query, query_embedding, answer, retrieved_docs, metadata_filter)
+    
+    finish_timing(timer, retrieval_legs=retrieval.timings)
+    return answer, "BYPASS" if bypass_cache else "MISS", timer, standalone_query
 
 @router.post("/chat/doubt", response_model=DoubtResponse)
-async def answer_doubt(request: DoubtRequest):
+async def answer_doubt(
+    request: DoubtRequest,
+    response: Response,
+    cache_control: Optional[str] = Header(None),
+    x_cache_bypass: Optional[str] = Header(None),
+):
     """
-    Endpoint to answer student doubts about SSC CGL exam using RAG.
+    Endpoint to answer student doubts about an exam (SSC CGL by default) using RAG.
+    Send `X-Cache-Bypass: true` or `Cache-Control: no-cache` to skip the answer cache.
+    Set `filters.exam` to pick the exam's corpus, and `filters` topic or source to
+    only retrieve matching chunks.
+    
+    Identical doubts (after normalizing case, spacing and trailing punctuation)
+    arriving while one is being answered share that answer; those responses
+    carry `X-Coalesced: true`.
+    
+    Pass a `session_id` to hold a conversation: follow-ups are answered with a
+    summary of the earlier turns plus the most recent ones.
     """
+    exam = get_exam(request.filters)
     try:
         query = request.query
-        print(f"\n--- RAG Query: {query} ---")
+        metadata_filter = get_metadata_filter(request.filters, exam)
+        bypass_cache = should_bypass_cache(cache_control, x_cache_bypass)
         
-        # Get vector store (real or dummy)
-        vector_store = get_vector_store()
+        start_time = time.perf_counter()
+        if request.session_id:
+            history = format_history(await load_conversation(request.session_id))
+            answer, cache_status, timer, standalone_query = await generate_doubt_answer(
+                query, exam, metadata_filter, bypass_cache, history
+            )
+            await record_turn(request.session_id, query, answer, exam)
+            coalesced = False
+        else:
+            (answer, cache_status, timer, standalone_query), coalesced = await doubt_flights.do(
+                query_key(query, metadata_filter, bypass_cache),
+                lambda: generate_doubt_answer(query, exam, metadata_filter, bypass_cache)
+            )
         
-        # Retrieve relevant documents (top 3)
-        retrieved_docs = vector_store.similarity_search(query, k=3)
+        response.headers["X-Cache"] = cache_status
+        if coalesced:
+            wait_time = time.perf_counter() - start_time
+            print(f"\nShared in-flight answer for: {query} (waited {wait_time:.2f}s)")
+            doubt_latency.observe({"total": wait_time}, prefix="coalesced")
+            response.headers["X-Coalesced"] = "true"
+        if DOUBT_SERVER_TIMING:
+            response.headers["Server-Timing"] = timer.server_timing()
         
-        # Print retrieved documents for debugging
-        print(f"\nRetrieved {len(retrieved_docs)} documents:")
-        for i, doc in enumerate(retrieved_docs):
-            source = doc.metadata.get("source", "Unknown")
-            topic = doc.metadata.get("topic", "Unknown")
-            print(f"\nDocument {i+1} - {source} - {topic}")
-            print(f"Content: {doc.page_content[:100]}...")  # Print first 100 chars
-            
-        # Format context from retrieved documents
-        context_texts = []
-        for i, doc in enumerate(retrieved_docs):
-            source = doc.metadata.get("source", "Unknown")
-            topic = doc.metadata.get("topic", "Unknown")
-            context_texts.append(f"[Document {i+1} - {source} - {topic}]\n{doc.page_content}")
+        return DoubtResponse(
+            answer=answer,
+            cached=cache_status == "HIT",
+            session_id=request.session_id,
+            standalone_query=standalone_query
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+@router.post("/chat/doubt/stream")
+async def stream_doubt(
+    request: DoubtRequest,
+    cache_control: Optional[str] = Header(None),
+    x_cache_bypass: Optional[str] = Header(None),
+):
+    """
+    Streaming variant of /chat/doubt using Server-Sent Events.
+    
+    Emits a `sources` event with the retrieved chunks, then one `token` event per
+    streamed piece of the answer, then a `done` event with usage and timings.
+    Failures after the stream has started are reported as an `error` event.
+    With a `session_id`, the turn is remembered once the answer is complete.
+    """
+    timer = StageTimer()
+    query = request.query
+    exam = get_exam(request.filters)
+    metadata_filter = get_metadata_filter(request.filters, exam)
+    print(f"\n--- RAG Stream Query ({exam}): {query} ---")
+    
+    # Retrieval happens before the response starts so its failures are a normal 500
+    try:
+        with timer.stage("corpus"):
+            manager = await corpora.get(exam)
+        
+        bypass_cache = should_bypass_cache(cache_control, x_cache_bypass)
+        history = format_history(await load_conversation(request.session_id)) if request.session_id else ""
+        standalone_query = None
+        if history:
+            # Follow-ups depend on the conversation, so the answer cache is skipped
+            with timer.stage("condense"):
+                standalone_query = await condense_query(history, query, exam)
+            bypass_cache = True
+        search_query = standalone_query or query
+        
+        with timer.stage("embed"):
+            query_embedding = await get_embeddings().aembed_query(search_query)
+        
+        cached = None
+        if not bypass_cache:
+            with timer.stage("cache_lookup"):
+                cached = answer_cache.lookup(query_embedding, cached_answer_validator(manager), metadata_filter)
+        retrieval = None
+        packed = None
+        if not cached:
+            with timer.stage("retrieval"):
+                retrieval = await retrieve_documents(manager, search_query, query_embedding, metadata_filter)
+            with timer.stage("context"):
+                packed = build_context(retrieval)
+        retrieved_docs = packed.documents if packed else []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+    
+    retrieval_time = timer.elapsed()
+    # Headers go out before generation, so they can only carry the stages up to here
+    server_timing = timer.server_timing() if DOUBT_SERVER_TIMING else None
+    
+    async def event_stream():
+        if cached:
+            entry, similarity = cached
+            yield sse_event("sources", {"sources": [{"id": cid} for cid in entry.chunk_ids], "cached": True})
+            yield sse_event("token", {"text": entry.answer})
+            finish_timing(timer, cached=True)
+            if request.session_id:
+                await record_turn(request.session_id, query, entry.answer, exam)
+            yield sse_event("done", {
+                "cached": True,
+                "session_id": request.session_id,
+                "similarity": similarity,
+                "usage": None,
+                "retrieval_seconds": retrieval_time,
+                "total_seconds": timer.timings["total"],
+                "stages": timer.timings
+            })
+            return
         
-        context = "\n\n".join(context_texts)
+        yield sse_event("sources", {
+            "sources": describe_sources(retrieved_docs),
+            "cached": False,
+            "standalone_query": standalone_query,
+            "retrieval_timings": retrieval.timings,
+            "context_tokens": packed.token_count
+        })
         
-        # Debug: Check if we're using real data or dummy data
-        using_supabase = os.getenv("USE_REAL_DATA", "false").lower() == "true"
-        print(f"\nUsing Supabase for retrieval: {using_supabase}")
+        parts = []
+        usage = None
+        first_token_time = None
+        try:
+            chain = get_prompt(exam) | get_llm()
+            context = format_context(retrieved_docs, packed.texts)
+            with timer.stage("llm_total"):
+                llm_start = time.perf_counter()
+                async for chunk in chain.astream({"context": context, "question": query, "history": prompt_history(history)}):
+                    if chunk.content:
+                        if first_token_time is None:
+                            first_token_time = timer.elapsed()
+                            timer.record("llm_first_token", time.perf_counter() - llm_start)
+                        parts.append(chunk.content)
+                        yield sse_event("token", {"text": chunk.content})
+                    if getattr(chunk, "usage_metadata", None):
+                        usage = dict(chunk.usage_metadata)
+        except Exception as e:
+            print(f"Error while streaming answer: {str(e)}")
+            yield sse_event("error", {"detail": f"Error generating answer: {str(e)}"})
+            return
+        
+        answer = "".join(parts)
+        if not history:
+            store_answer(manager, query, query_embedding, answer, retrieved_docs, metadata_filter)
+        if request.session_id:
+            await record_turn(request.session_id, query, answer, exam)
+        finish_timing(timer, retrieval_legs=retrieval.timings)
+        
+        yield sse_event("done", {
+            "cached": False,
+            "session_id": request.session_id,
+            "usage": usage,
+            "retrieval_seconds": retrieval_time,
+            "first_token_seconds": first_token_time,
+            "total_seconds": timer.timings["total"],
+            "stages": timer.timings
+        })
+    
+    headers = {
+        "Cache-Control": "no-cache",
+        # Stop reverse proxies (nginx, Render) from buffering the stream
+        "X-Accel-Buffering": "no",
+        "X-Cache": "HIT" if cached else ("BYPASS" if bypass_cache else "MISS")
+    }
+    if server_timing:
+        headers["Server-Timing"] = server_timing
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
+@router.post("/chat/doubt/batch", response_model=DoubtBatchResponse)
+async def answer_doubt_batch(
+    request: DoubtBatchRequest,
+    cache_control: Optional[str] = Header(None),
+    x_cache_bypass: Optional[str] = Header(None),
+):
+    """
+    Answer many doubts in one request, e.g. a doubt sheet or an FAQ refresh.
+    
+    All queries are embedded in one call and searched together, then answers are
+    generated with at most DOUBT_BATCH_CONCURRENCY LLM calls in flight. Results are
+    returned in request order; a query that fails, or is blank, gets an `error`
+    instead of failing the whole batch.
+    """
+    queries = request.queries
+    if len(queries) > DOUBT_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {DOUBT_BATCH_MAX_QUERIES} queries per batch")
+    if not queries:
+        return DoubtBatchResponse(results=[])
+    
+    timer = StageTimer()
+    exam = get_exam(request.filters)
+    try:
+        metadata_filter = get_metadata_filter(request.filters, exam)
+        print(f"\n--- RAG Batch ({exam}): {len(queries)} queries ---")
         
-        # Generate answer using OpenAI
-        llm = ChatOpenAI(model="gpt-4-turbo", temperature=0.1)
-        prompt = get_prompt()
+        with timer.stage("corpus"):
+            manager = await corpora.get(exam)
+            vector_store = await manager.get()
+        is_cached_answer_valid = cached_answer_validator(manager)
+        results = [DoubtBatchItem(query=query) for query in queries]
+        # Blank queries are answered with an error and never embedded or sent to the LLM
+        answerable = [i for i, query in enumerate(queries) if query.strip()]
+        for i in set(range(len(queries))) - set(answerable):
+            results[i].error = "Query must not be empty"
+        query_embeddings: List[Optional[List[float]]] = [None] * len(queries)
+        if answerable:
+            with timer.stage("embed"):
+                vectors = await get_embeddings().aembed_documents([queries[i] for i in answerable])
+            for i, vector in zip(answerable, vectors):
+                query_embeddings[i] = vector
         
-        chain = prompt | llm
-        response = chain.invoke({"context": context, "question": query})
+        bypass_cache = should_bypass_cache(cache_control, x_cache_bypass)
+        # Index of the first occurrence of each query still needing an answer; repeats reuse it
+        pending: Dict[str, int] = {}
+        for i in answerable:
+            query, query_embedding = queries[i], query_embeddings[i]
+            if query in pending:
+                continue
+            cached = None if bypass_cache else answer_cache.lookup(query_embedding, is_cached_answer_valid, metadata_filter)
+            if cached:
+                results[i].answer = cached[0].answer
+                results[i].cached = True
+            else:
+                pending[query] = i
         
-        # Extract the answer from the response
-        answer = response.content
-        print(f"\nGenerated answer (first 100 chars): {answer[:100]}...")
+        if pending:
+            indices = list(pending.values())
+            start_time = time.perf_counter()
+            with timer.stage("retrieval"):
+                try:
+                    retrievals = await batch_hybrid_search(
+                        vector_store, manager.lexical_index,
+                        [queries[i] for i in indices], [query_embeddings[i] for i in indices],
+                        metadata_filter=retrieval_filter(metadata_filter)
+                    )
+                except Exception as e:
+                    vector_store_health.record_retrieval(time.perf_counter() - start_time, error=e)
+                    raise
+            vector_store_health.record_retrieval(timer.timings["retrieval"])
+            leg_times = ", ".join(f"{leg} {seconds * 1000:.1f}ms" for leg, seconds in retrievals[0].timings.items())
+            print(f"\nRetrieved context for {len(indices)} queries ({leg_times})")
+            
+            with timer.stage("context"):
+                contexts = [pack_context(r.documents, r.similarities) for r in retrievals]
+            print(f"Packed ~{sum(p.token_count for p in contexts)} context tokens in total")
+            
+            chain = get_prompt(exam) | get_llm()
+            with timer.stage("llm_total"):
+                outputs = await chain.abatch(
+                    [
+                        {"context": format_context(packed.documents, packed.texts), "question": queries[i]}
+                        for i, packed in zip(indices, contexts)
+                    ],
+                    config={"max_concurrency": DOUBT_BATCH_CONCURRENCY},
+                    return_exceptions=True
+                )
+            for i, packed, output in zip(indices, contexts, outputs):
+                if isinstance(output, Exception):
+                    print(f"Error answering batch query {i}: {str(output)}")
+                    results[i].error = f"Error generating answer: {str(output)}"
+                    continue
+                results[i].answer = output.content
+                store_answer(manager, queries[i], query_embeddings[i], output.content, packed.documents, metadata_filter)
         
-        return DoubtResponse(answer=answer)
+        for i, query in enumerate(queries):
+            first = pending.get(query)
+            if first is not None and first != i:
+                results[i] = results[first].model_copy(update={"query": query})
+        
+        print(f"\nAnswered {sum(r.error is None for r in results)}/{len(results)} batch queries "
+              f"({sum(r.cached for r in results)} from cache)")
+        # Whole-batch stage times, kept apart from single-doubt latencies
+        timer.record("total", timer.elapsed())
+        doubt_latency.observe(timer.timings, prefix="batch")
+        return DoubtBatchResponse(results=results)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
+def corpus_status(exam):
+    """Status of an exam's vector store, or None while it isn't loaded"""
+    manager = corpora.loaded(exam)
+    return manager.status() if manager is not None else None
+
+@router.post("/chat/doubt/vector-store/refresh")
+async def refresh_vector_store(exam: Optional[str] = None):
+    """Rebuild an exam's vector store (or every loaded one), e.g. after new documents were ingested"""
+    if exam is not None and exam not in EXAMS:
+        raise HTTPException(status_code=404, detail=f"Unknown exam {exam}")
+    try:
+        await corpora.refresh(exam)
+        return {"status": "success", "vector_store": corpus_status(exam or DEFAULT_EXAM), "corpora": corpora.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error refreshing vector store: {str(e)}")
+
+@router.post("/chat/doubt/vector-store/invalidate")
+async def invalidate_vector_store(exam: Optional[str] = None):
+    """Unload an exam's vector store (or all of them) so the next doubt request rebuilds it"""
+    await corpora.unload(exam)
+    return {"status": "success", "vector_store": corpus_status(exam or DEFAULT_EXAM), "corpora": corpora.stats()}
+
+@router.get("/chat/doubt/sessions/{session_id}")
+async def get_session(session_id: str):
+    """The conversation summary and recent turns remembered for a session"""
+    conversation = await session_store.get(session_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {
+        "session_id": session_id,
+        "summary": conversation.summary,
+        "turns": [{"question": turn.question, "answer": turn.answer} for turn in conversation.turns],
+        "turn_count": conversation.turn_count,
+        "updated_at": conversation.updated_at
+    }
+
+@router.delete("/chat/doubt/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Forget a conversation"""
+    await session_store.delete(session_id)
+    return {"status": "success"}
+
+@router.post("/chat/doubt/cache/clear")
+async def clear_answer_cache():
+    """Drop every cached doubt answer"""
+    answer_cache.clear()
+    return {"status": "success", "answer_cache": answer_cache.stats()}
+
 @router.get("/chat/doubt/diagnostic")
 async def diagnose_retrieval():
-    """Diagnostic endpoint to check if Supabase retrieval is working"""
+    """
+    Diagnostic endpoint to check if retrieval is working.
+    Served from cached state only: the document count and retrieval health
+    come from the background health snapshot, not from live queries.
+    """
     try:
         # Check if we're using real data
         use_real_data = os.getenv("USE_REAL_DATA", "false").lower() == "true"
+        health = vector_store_health.snapshot()
+        if health["document_count"] is None and not use_real_data:
+            # Not counted yet; the dummy store always holds the hardcoded chunks
+            health["document_count"] = len(SSC_CGL_CHUNKS)
         
-        # Initialize the embeddings model
-        embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-        
-        if use_real_data:
-            # Check Supabase connection
-            try:
-                # Get document count from Supabase
-                result = supabase.table("documents").select("id", count="exact").execute()
-                document_count = result.count if hasattr(result, 'count') else 0
-                
-                # Test vector retrieval with a simple query
-                test_query = "SSC CGL exam structure"
-                vector_store = SupabaseVectorStore(
-                    client=supabase,
-                    embedding=embeddings,
-                    table_name="documents",
-                    query_name="match_documents"
-                )
-                
-                retrieved = vector_store.similarity_search(test_query, k=1)
-                retrieval_working = len(retrieved) > 0
-                
-                return {
-                    "status": "success",
-                    "using_real_data": True,
-                    "document_count": document_count,
-                    "retrieval_working": retrieval_working,
-                    "retrieved_sample": retrieved[0].page_content[:100] + "..." if retrieval_working else None
-                }
-            except Exception as e:
-                return {
-                    "status": "error",
-                    "using_real_data": True,
-                    "error": str(e),
-                    "fallback_to_dummy": True
-                }
-        else:
-            # Using dummy data
-            return {
-                "status": "success", 
-                "using_real_data": False,
-                "document_count": len(SSC_CGL_CHUNKS),
-                "message": "Using dummy data (FAISS with hardcoded documents)"
-            }
+        diagnostic = {
+            "status": "success",
+            "using_real_data": use_real_data,
+            "document_count": health["document_count"],
+            "retrieval_working": health["retrieval_working"],
+            "health": health,
+            "exams": EXAMS,
+            "vector_store": corpus_status(DEFAULT_EXAM),
+            "corpora": corpora.stats(),
+            "embedding_cache": embedding_cache_stats(),
+            "embedding_batcher": embedding_batcher_stats(),
+            "answer_cache": answer_cache.stats(),
+            "single_flight": doubt_flights.stats(),
+            "sessions": session_store.stats(),
+            "latency": doubt_latency.summary()
+        }
+        if not use_real_data:
+            diagnostic["message"] = "Using dummy data (FAISS with hardcoded documents)"
+        elif health["document_count_error"]:
+            diagnostic["status"] = "error"
+            diagnostic["error"] = health["document_count_error"]
+        return diagnostic
             
     except Exception as e:
-        return {"status": "error", "message": str(e)} 
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
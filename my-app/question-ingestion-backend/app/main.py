@@ -1,3 +1,6 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -6,10 +9,30 @@ import time
 from app.api.upload import router as upload_router
 from app.api.chatbot import router as chatbot_router
 from app.api.extract import router as extract_router
-from app.api.chat_doubt import router as chat_doubt_router
+from app.api.chat_doubt import DEFAULT_EXAM, corpora, router as chat_doubt_router, vector_store_health
 from app.utils.logging_config import logger
 
-app = FastAPI()
+# Upper bound on threads used for blocking work (vector search, Supabase, SQLite)
+# offloaded from the event loop
+RAG_THREAD_POOL_WORKERS = int(os.getenv("RAG_THREAD_POOL_WORKERS", "16"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # asyncio.to_thread and LangChain's async fallbacks both use the default executor
+    executor = ThreadPoolExecutor(max_workers=RAG_THREAD_POOL_WORKERS, thread_name_prefix="rag")
+    asyncio.get_running_loop().set_default_executor(executor)
+    
+    # Health first: the vector store build reads its document count
+    await vector_store_health.start()
+    # Build the default exam's vector store once per process instead of per request;
+    # other exams are loaded on first use
+    await corpora.preload([DEFAULT_EXAM])
+    yield
+    await corpora.stop()
+    await vector_store_health.stop()
+    executor.shutdown(wait=False)
+
+app = FastAPI(lifespan=lifespan)
 
 # Get allowed origins from environment variable or use defaults
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,https://edtec-5ctehyubc-app-dynamics-projects.vercel.app")
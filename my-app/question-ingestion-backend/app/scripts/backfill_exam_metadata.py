@@ -0,0 +1,64 @@
+"""
+Tag documents rows that have no exam in their metadata with one.
+
+Chunks ingested before exams were introduced carry no metadata.exam, but
+doubt retrieval, the lexical index and `ingest_documents --full` all scope
+the documents table by exam, so those rows are invisible to every query until
+they are tagged. Run once from the backend root:
+    python -m app.scripts.backfill_exam_metadata [--exam ssc_cgl]
+
+Rows are updated in id order in small, separately committed batches, so the
+API keeps serving while it runs. Running it again only touches rows that are
+still untagged.
+"""
+import argparse
+
+import psycopg2
+
+from app.scripts.setup_supabase import get_database_url
+
+# The rows the original ingester wrote
+LEGACY_ROWS = "(metadata IS NULL OR NOT metadata ? 'exam')"
+
+
+def backfill(database_url, exam, batch_size=1000):
+    conn = psycopg2.connect(database_url)
+    done = 0
+    after = "00000000-0000-0000-0000-000000000000"
+    try:
+        with conn.cursor() as cur:
+            while True:
+                cur.execute(f"""
+                    UPDATE documents
+                    SET metadata = coalesce(metadata, '{{}}'::jsonb) || jsonb_build_object('exam', %s::text)
+                    WHERE id IN (
+                        SELECT id FROM documents
+                        WHERE id > %s AND {LEGACY_ROWS}
+                        ORDER BY id LIMIT %s
+                    )
+                    RETURNING id
+                """, (exam, after, batch_size))
+                ids = [row_id for row_id, in cur.fetchall()]
+                conn.commit()
+                if not ids:
+                    break
+                after = str(max(ids))
+                done += len(ids)
+                print(f"Tagged {done} rows with exam {exam}")
+            cur.execute("ANALYZE documents")
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"Done: {done} rows tagged. Restart the API (or refresh its corpus) to add them to the lexical index.")
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tag documents rows without an exam")
+    parser.add_argument("--exam", default="ssc_cgl", help="Exam the untagged rows belong to (the default exam)")
+    parser.add_argument("--database-url", default=None, help="Defaults to DATABASE_URL / the Supabase project")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per committed batch")
+    args = parser.parse_args()
+
+    backfill(args.database_url or get_database_url(), args.exam, args.batch_size)
@@ -0,0 +1,137 @@
+"""
+Check that concurrent doubts are answered in parallel instead of queueing
+behind each other on the event loop.
+
+Start the API, then run from the backend root:
+    python -m app.scripts.bench_doubt_concurrency --url http://localhost:8000 -n 10
+
+One doubt is timed on its own, then N run concurrently while /api/health is
+polled. With a non-blocking pipeline the concurrent batch takes roughly one
+call's latency and the health check stays fast. The exit status is non-zero
+when it doesn't, so the check can gate CI.
+
+--in-process runs the app inside this script instead (no server, no OpenAI
+key) with the chat model replaced by a stub that streams its answer over
+--stub-llm-ms, like a network call. Combined with the local embedder it is a
+self-contained, repeatable check:
+    EMBEDDING_PROVIDER=hashed python -m app.scripts.bench_doubt_concurrency --in-process
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+IN_PROCESS_URL = "http://doubt-bench"
+STUB_ANSWER = "Stub answer for the concurrency check."
+
+QUERIES = [
+    "What is the Tier I syllabus?",
+    "How many tiers does SSC CGL have?",
+    "Which topics matter most in Quantitative Aptitude?",
+    "What is the age limit for SSC CGL?",
+    "What does General Awareness cover?",
+    "Which papers are in Tier II?",
+    "What is tested in English Comprehension?",
+    "Which reasoning topics should I focus on?",
+]
+
+
+async def ask(client, url, query):
+    start = time.perf_counter()
+    # Bypass the answer cache so every call does real retrieval and generation
+    response = await client.post(
+        f"{url}/api/chat/doubt",
+        json={"query": query},
+        headers={"X-Cache-Bypass": "true"},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def poll_health(client, url, stop_event, latencies):
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        await client.get(f"{url}/api/health")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+@asynccontextmanager
+async def in_process_client(stub_llm_ms):
+    """An httpx client bound to app.main's app, with its lifespan run and a stub chat model."""
+    from langchain_core.language_models import FakeListChatModel
+
+    # chat_doubt wants these at import; with the dummy corpus and a local embedder
+    # neither OpenAI nor Supabase is actually called
+    os.environ.setdefault("OPENAI_API_KEY", "unused-in-process")
+    os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+    os.environ.setdefault("SUPABASE_SERVICE_KEY", "unused-in-process")
+    from app.api import chat_doubt
+    from app.main import app
+
+    # FakeListChatModel sleeps before every character it streams
+    delay = stub_llm_ms / 1000 / len(STUB_ANSWER)
+    chat_doubt.get_llm = lambda: FakeListChatModel(responses=[STUB_ANSWER], sleep=delay)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), timeout=300) as client:
+            yield client
+
+
+async def run(url, concurrency, max_ratio, in_process=False, stub_llm_ms=1000):
+    if in_process:
+        url = IN_PROCESS_URL
+        connect = in_process_client(stub_llm_ms)
+    else:
+        connect = httpx.AsyncClient(timeout=300)
+    async with connect as client:
+        # Warm up (vector store, connections) before measuring
+        await ask(client, url, QUERIES[0])
+
+        single = await ask(client, url, QUERIES[1])
+        print(f"Single doubt: {single:.2f}s")
+
+        health_latencies = []
+        stop_event = asyncio.Event()
+        health_task = asyncio.create_task(poll_health(client, url, stop_event, health_latencies))
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*[
+            ask(client, url, f"{QUERIES[i % len(QUERIES)]} (#{i})") for i in range(concurrency)
+        ])
+        wall = time.perf_counter() - start
+
+        stop_event.set()
+        await health_task
+
+    ratio = wall / single
+    print(f"{concurrency} concurrent doubts: {wall:.2f}s wall, slowest {max(latencies):.2f}s "
+          f"({ratio:.1f}x a single doubt; fully serial would be ~{concurrency}x)")
+    if health_latencies:
+        print(f"/api/health during load: max {max(health_latencies) * 1000:.0f}ms "
+              f"over {len(health_latencies)} probes")
+
+    if ratio > max_ratio:
+        print(f"FAIL: concurrent batch took more than {max_ratio}x a single doubt")
+        return 1
+    print("PASS")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure concurrent /api/chat/doubt latency")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the running API")
+    parser.add_argument("-n", "--concurrency", type=int, default=10, help="Number of concurrent doubts")
+    parser.add_argument("--max-ratio", type=float, default=2.0,
+                        help="Fail if the concurrent batch takes longer than this multiple of one doubt")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run the app in this process with a stub chat model instead of calling --url")
+    parser.add_argument("--stub-llm-ms", type=float, default=1000,
+                        help="How long the stub chat model takes per answer (--in-process)")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(run(args.url.rstrip("/"), args.concurrency, args.max_ratio,
+                             args.in_process, args.stub_llm_ms)))
@@ -0,0 +1,196 @@
+"""
+Compare retrieval recall, table size and search latency of reduced-dimension
+and float16 (halfvec) embeddings against the full-size vectors.
+
+Point it at a local Postgres with pgvector >= 0.7 (never production) and run
+from the backend root:
+    DATABASE_URL=postgresql://postgres@localhost/postgres \
+        python -m app.scripts.benchmark_embedding_dimensions --dimensions 256 512 1024 --scale 100000
+
+The study material is split like ingestion does and embedded once at full
+size (through the embedding cache). Smaller variants are derived by
+truncating and re-normalizing, which is what text-embedding-3 returns for a
+smaller `dimensions`. Recall@k is measured in numpy against the full-size
+float32 ranking, after rounding to the storage type.
+
+For latency each variant is loaded into documents in a scratch schema (the
+corpus tiled up to --scale rows, with jitter), and match_documents is timed
+with a sequential scan and through the ANN index, as benchmark_pgvector_index
+does. --recall-only skips the database.
+"""
+import argparse
+import json
+import time
+import uuid
+
+import numpy as np
+import psycopg2
+from langchain_community.document_loaders import DirectoryLoader, TextLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.scripts.benchmark_pgvector_index import summarize, time_queries
+from app.scripts.setup_supabase import (
+    ANN_INDEX_TYPE,
+    build_index_sql,
+    build_setup_sql,
+    can_index,
+    get_database_url,
+)
+from app.services.embeddings import create_embeddings
+from app.services.pgvector_loader import PgvectorCopyLoader
+
+BENCH_SCHEMA = "dimensions_bench"
+LOAD_BATCH = 10_000
+
+QUERIES = [
+    "What is the Tier I syllabus?",
+    "How many tiers does SSC CGL have?",
+    "Which topics matter most in Quantitative Aptitude?",
+    "What is the age limit for SSC CGL?",
+    "What does General Awareness cover?",
+    "Which papers are in Tier II?",
+    "What is tested in English Comprehension?",
+    "Which reasoning topics should I focus on?",
+    "What is the Data Entry Skill Test?",
+    "How much time is given for Tier I?",
+]
+
+
+def reduce(vectors, dimensions, dtype):
+    reduced = vectors[:, :dimensions]
+    reduced = reduced / np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced.astype(dtype)
+
+
+def top_k(corpus, queries, k):
+    scores = queries.astype(np.float32) @ corpus.astype(np.float32).T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def tiled_batches(corpus, scale):
+    """The corpus repeated up to `scale` rows, jittered so the copies aren't exact duplicates"""
+    rng = np.random.default_rng(0)
+    for start in range(0, scale, LOAD_BATCH):
+        rows = np.arange(start, min(start + LOAD_BATCH, scale))
+        vectors = corpus[rows % len(corpus)].astype(np.float32)
+        vectors = vectors + rng.normal(scale=1e-3, size=vectors.shape).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        yield rows, vectors
+
+
+def pgvector_latency(conn, corpus, queries, storage, k, scale):
+    """
+    Loads `scale` rows of the variant into a fresh documents table and times
+    match_documents with a sequential scan and through the ANN index.
+    Also returns the table size, since that is what halfvec and fewer
+    dimensions save.
+    """
+    dimensions = corpus.shape[1]
+    index_type = ANN_INDEX_TYPE if can_index(dimensions, storage) else "none"
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        # Unqualified names (documents, match_documents) now resolve to the scratch schema
+        cur.execute(f"SET search_path TO {BENCH_SCHEMA}, public")
+        cur.execute(build_setup_sql(dimensions, storage, "none"))
+    conn.commit()
+
+    loader = PgvectorCopyLoader(conn, upsert=False, storage=storage)
+    for rows, vectors in tiled_batches(corpus, scale):
+        loader.copy([str(uuid.uuid4()) for _ in rows], [f"chunk {n}" for n in rows],
+                    [{"n": int(n)} for n in rows], vectors)
+    loader.commit(build_index_sql(dimensions, storage, index_type) or None)
+
+    result = {"index": index_type}
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_total_relation_size('documents')")
+        result["table_mb"] = round(cur.fetchone()[0] / 2**20, 1)
+    conn.commit()
+    # The sequential scan is exact, so the index's recall is measured against it
+    latencies, exact = time_queries(conn, queries, k, exact=True)
+    result["sequential_scan"] = summarize(latencies, exact, exact, k)
+    if index_type != "none":
+        latencies, found = time_queries(conn, queries, k, exact=False)
+        result["indexed"] = summarize(latencies, found, exact, k)
+    return result
+
+
+def run(directory, dimensions_list, k, scale, database_url=None, keep=False):
+    documents = DirectoryLoader(directory, glob="**/*.txt", loader_cls=TextLoader).load()
+    chunks = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50).split_documents(documents)
+    k = min(k, len(chunks))
+
+    embeddings = create_embeddings()
+    corpus = np.asarray(embeddings.embed_documents([c.page_content for c in chunks]), dtype=np.float32)
+    queries = np.asarray(embeddings.embed_documents(QUERIES), dtype=np.float32)
+    full_dimensions = corpus.shape[1]
+    reference = top_k(reduce(corpus, full_dimensions, np.float32), reduce(queries, full_dimensions, np.float32), k)
+
+    conn = psycopg2.connect(database_url) if database_url else None
+    results = []
+    try:
+        for dimensions in sorted(set(dimensions_list + [full_dimensions])):
+            if dimensions > full_dimensions:
+                continue
+            for storage, dtype in (("vector", np.float32), ("halfvec", np.float16)):
+                reduced_corpus = reduce(corpus, dimensions, dtype)
+                reduced_queries = reduce(queries, dimensions, dtype)
+                found = top_k(reduced_corpus, reduced_queries, k)
+                recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, reference)])
+                result = {
+                    "dimensions": dimensions,
+                    "storage": storage,
+                    "bytes_per_vector": dimensions * np.dtype(dtype).itemsize,
+                    f"recall@{k}": round(float(recall), 4),
+                    "pgvector": None,
+                }
+                if conn is not None:
+                    try:
+                        start = time.perf_counter()
+                        result["pgvector"] = pgvector_latency(conn, reduced_corpus, reduced_queries, storage, k, scale)
+                        print(f"  {storage}({dimensions}) loaded and timed in {time.perf_counter() - start:.1f}s")
+                    except psycopg2.errors.UndefinedObject as e:
+                        # halfvec needs pgvector >= 0.7
+                        conn.rollback()
+                        print(f"  {storage}({dimensions}) skipped: {str(e).splitlines()[0]}")
+                results.append(result)
+    finally:
+        if conn is not None:
+            if not keep:
+                with conn.cursor() as cur:
+                    cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+                conn.commit()
+            conn.close()
+
+    def p50(row, plan):
+        timings = (row["pgvector"] or {}).get(plan)
+        return f"{timings['p50_ms']:>9.2f}" if timings else f"{'-':>9}"
+
+    print(f"\n{len(chunks)} chunks, {len(QUERIES)} queries"
+          + (f", pgvector latency over {scale} rows (p50 ms)" if conn is not None else "") + "\n")
+    print(f"{'dims':>6} {'storage':>8} {'bytes':>7} {'recall@' + str(k):>9} {'table MB':>9} {'seq scan':>9} {'index':>9}")
+    for row in results:
+        table_mb = f"{row['pgvector']['table_mb']:>9.1f}" if row["pgvector"] else f"{'-':>9}"
+        print(f"{row['dimensions']:>6} {row['storage']:>8} {row['bytes_per_vector']:>7} "
+              f"{row[f'recall@{k}']:>9.3f} {table_mb} {p50(row, 'sequential_scan')} {p50(row, 'indexed')}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark reduced-dimension embeddings")
+    parser.add_argument("--directory", default="./data/ssc_cgl_materials", help="Study material to embed")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[256, 512, 1024], help="Sizes to compare")
+    parser.add_argument("-k", type=int, default=3, help="Top-k used for recall")
+    parser.add_argument("--scale", type=int, default=100_000, help="Rows loaded into pgvector for latency")
+    parser.add_argument("--database-url", default=None, help="Defaults to DATABASE_URL / the Supabase project")
+    parser.add_argument("--recall-only", action="store_true", help="Only measure recall; no database needed")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {BENCH_SCHEMA} schema afterwards")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    database_url = None if args.recall_only else args.database_url or get_database_url()
+    results = run(args.directory, args.dimensions, args.k, args.scale, database_url, args.keep)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,171 @@
+"""
+Benchmark how fast ingestion can write embedded chunks to the documents table:
+the Supabase REST API (what `ingest_documents --loader rest` does) against
+COPY over a direct connection (`--loader copy`).
+
+Point it at a local Postgres with pgvector (never production) and run from the
+backend root:
+    DATABASE_URL=postgresql://postgres@localhost/postgres \\
+        python -m app.scripts.benchmark_ingest_load --rows 20000 --dimensions 1536
+
+The psycopg2 methods run in a scratch schema that is dropped afterwards:
+  insert       batched multi-row INSERTs (execute_values), the best plain SQL can do
+  copy         binary COPY straight into documents (ingest_documents --loader copy --full)
+  copy-upsert  binary COPY into a temporary table merged with ON CONFLICT (incremental runs)
+
+Add --rest to also time upserts through the Supabase API of a local stack
+(`supabase start`; SUPABASE_URL / SUPABASE_SERVICE_KEY). Those go to the
+real documents table, so --dimensions must match it; the benchmark rows are
+tagged in their metadata and deleted afterwards.
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.scripts.migrate_embedding_dimensions import vector_literal
+from app.scripts.setup_supabase import build_setup_sql, get_database_url
+from app.services.pgvector_loader import PgvectorCopyLoader
+
+BENCH_SCHEMA = "load_bench"
+METHODS = ("insert", "copy", "copy-upsert")
+WORDS = ("percentage ratio average interest profit discount mixture time work distance mensuration algebra "
+         "geometry trigonometry reasoning awareness comprehension tier syllabus exam marks").split()
+
+
+def synthetic_batches(rows, dimensions, batch_size, seed=42):
+    """Yields (ids, contents, metadatas, vectors) batches shaped like ingested chunks"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, batch_size):
+        count = min(batch_size, rows - start)
+        vectors = rng.normal(size=(count, dimensions)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [str(uuid.uuid4()) for _ in range(count)]
+        contents = [" ".join(rng.choice(WORDS, 80)) for _ in range(count)]
+        metadatas = [{"exam": "load_bench", "topic": "synthetic", "n": start + i, "token_count": 120}
+                     for i in range(count)]
+        yield ids, contents, metadatas, vectors.tolist()
+
+
+def reset_table(conn, dimensions):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        # Unqualified names (documents) now resolve to the scratch schema
+        cur.execute(f"SET search_path TO {BENCH_SCHEMA}, public")
+        cur.execute(build_setup_sql(dimensions, "vector", "none"))
+    conn.commit()
+
+
+def load_insert(conn, batches):
+    with conn.cursor() as cur:
+        for ids, contents, metadatas, vectors in batches:
+            execute_values(
+                cur,
+                "INSERT INTO documents (id, content, metadata, embedding) VALUES %s",
+                [(row_id, content, json.dumps(metadata), vector_literal(vector))
+                 for row_id, content, metadata, vector in zip(ids, contents, metadatas, vectors)],
+                page_size=len(ids),
+            )
+    conn.commit()
+
+
+def load_copy(conn, batches, upsert):
+    loader = PgvectorCopyLoader(conn, upsert=upsert)
+    for batch in batches:
+        loader.copy(*batch)
+    loader.commit()
+
+
+def rest_store():
+    from langchain_community.vectorstores import SupabaseVectorStore
+    from supabase.client import create_client
+
+    from app.services.hashed_embeddings import HashedNgramEmbeddings
+
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+    # The embedding function is never called; vectors are passed in
+    return SupabaseVectorStore(client=client, embedding=HashedNgramEmbeddings(), table_name="documents",
+                               query_name="match_documents")
+
+
+def load_rest(store, batches, run_id):
+    from langchain_core.documents import Document
+
+    for ids, contents, metadatas, vectors in batches:
+        documents = [Document(page_content=content, metadata={**metadata, "load_benchmark": run_id})
+                     for content, metadata in zip(contents, metadatas)]
+        store.add_vectors(vectors, documents, ids=ids)
+
+
+def delete_rest_rows(store, run_id):
+    store._client.table("documents").delete().contains("metadata", {"load_benchmark": run_id}).execute()
+
+
+def run(database_url, rows, dimensions, batch_size, methods, rest, keep):
+    # Rows are generated up front so only the writes are timed
+    batches = list(synthetic_batches(rows, dimensions, batch_size))
+    results = []
+
+    def record(method, seconds):
+        results.append({"method": method, "rows": rows, "dimensions": dimensions, "batch_size": batch_size,
+                        "seconds": round(seconds, 2), "rows_per_second": round(rows / seconds, 1)})
+        print(f"  {method:<12} {seconds:8.2f}s  {rows / seconds:10,.0f} rows/s")
+
+    print(f"Loading {rows} rows of {dimensions} dimensions in batches of {batch_size}")
+    if rest:
+        store, run_id = rest_store(), str(uuid.uuid4())
+        try:
+            start = time.perf_counter()
+            load_rest(store, batches, run_id)
+            record("rest", time.perf_counter() - start)
+        finally:
+            # Not timed, like dropping the scratch schema after the psycopg2 methods
+            delete_rest_rows(store, run_id)
+
+    conn = psycopg2.connect(database_url)
+    try:
+        for method in methods:
+            reset_table(conn, dimensions)
+            start = time.perf_counter()
+            if method == "insert":
+                load_insert(conn, batches)
+            else:
+                load_copy(conn, batches, upsert=method == "copy-upsert")
+            record(method, time.perf_counter() - start)
+    finally:
+        if not keep:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+            conn.commit()
+        conn.close()
+
+    baseline = results[0]["rows_per_second"]
+    for result in results[1:]:
+        print(f"  {result['method']} is {result['rows_per_second'] / baseline:.1f}x {results[0]['method']}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark REST vs COPY loading of the documents table")
+    parser.add_argument("--database-url", default=None, help="Defaults to DATABASE_URL / the Supabase project")
+    parser.add_argument("--rows", type=int, default=20_000, help="Rows to load per method")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Vector size")
+    parser.add_argument("--batch-size", type=int, default=256, help="Rows per request / COPY")
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS),
+                        help="psycopg2 methods to time")
+    parser.add_argument("--rest", action="store_true", help="Also time upserts through the Supabase API")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {BENCH_SCHEMA} schema afterwards")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.database_url or get_database_url(), args.rows, args.dimensions, args.batch_size,
+                  args.methods, args.rest, args.keep)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,186 @@
+"""
+Benchmark match_documents with and without an ANN index on synthetic vectors.
+
+Point it at a local Postgres with pgvector (never production) and run from the
+backend root:
+    DATABASE_URL=postgresql://postgres@localhost/postgres \\
+        python -m app.scripts.benchmark_pgvector_index --rows 10000 100000 1000000
+
+Everything happens in a scratch schema that is dropped afterwards. For each
+table size, clustered unit vectors are loaded with COPY, match_documents is
+timed with index scans disabled (the old sequential scan behaviour), then the
+index is built and the same queries are timed again. Recall@k is measured
+against the exact top-k computed in numpy while loading.
+"""
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+import psycopg2
+
+from app.scripts.setup_supabase import (
+    HNSW_EF_SEARCH,
+    INDEX_TYPES,
+    IVFFLAT_PROBES,
+    build_index_sql,
+    build_match_documents_sql,
+    build_setup_sql,
+    get_database_url,
+)
+
+BENCH_SCHEMA = "vector_bench"
+LOAD_BATCH = 10_000
+CLUSTERS = 100
+
+
+def synthetic_batches(rows, centroids, seed):
+    """Yields float32 batches of unit vectors scattered around the centroids"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, LOAD_BATCH):
+        count = min(LOAD_BATCH, rows - start)
+        labels = rng.integers(0, len(centroids), count)
+        vectors = centroids[labels] + rng.normal(scale=0.6, size=(count, centroids.shape[1]))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        yield start, vectors.astype(np.float32)
+
+
+def copy_batch(cur, start, vectors):
+    """COPY one batch in text format; metadata.n records the row number for recall checks"""
+    vector_text = io.StringIO()
+    np.savetxt(vector_text, vectors, fmt="%.6f", delimiter=",")
+    buffer = io.StringIO()
+    for offset, line in enumerate(vector_text.getvalue().splitlines()):
+        n = start + offset
+        buffer.write(f"synthetic row {n}\t{{\"n\": {n}}}\t[{line}]\n")
+    buffer.seek(0)
+    cur.copy_expert("COPY documents (content, metadata, embedding) FROM STDIN", buffer)
+
+
+def load_and_score(conn, rows, centroids, queries, k, seed):
+    """Loads `rows` vectors and returns the exact top-k row numbers per query"""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+    with conn.cursor() as cur:
+        for start, vectors in synthetic_batches(rows, centroids, seed):
+            copy_batch(cur, start, vectors)
+            scores = np.concatenate([best_scores, queries @ vectors.T], axis=1)
+            ids = np.concatenate([best_ids, np.broadcast_to(np.arange(start, start + len(vectors)), (len(queries), len(vectors)))], axis=1)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_ids = np.take_along_axis(ids, top, axis=1)
+        cur.execute("ANALYZE documents")
+    conn.commit()
+    return [set(row) for row in best_ids]
+
+
+def time_queries(conn, queries, k, exact):
+    latencies = []
+    found = []
+    with conn.cursor() as cur:
+        cur.execute(f"SET enable_indexscan = {'off' if exact else 'on'}")
+        for query in queries:
+            literal = "[" + ",".join(f"{x:.6f}" for x in query) + "]"
+            start = time.perf_counter()
+            cur.execute("SELECT metadata->>'n' FROM match_documents(%s::vector, -1, %s)", (literal, k))
+            rows = cur.fetchall()
+            latencies.append(time.perf_counter() - start)
+            found.append({int(n) for (n,) in rows})
+        cur.execute("RESET enable_indexscan")
+    conn.commit()
+    return latencies, found
+
+
+def summarize(latencies, found, truth, k):
+    ms = np.asarray(latencies) * 1000
+    recall = np.mean([len(f & t) / k for f, t in zip(found, truth)])
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        f"recall@{k}": round(float(recall), 4),
+    }
+
+
+def run(database_url, sizes, dimensions, index_type, query_count, k, keep):
+    rng = np.random.default_rng(42)
+    centroids = rng.normal(size=(CLUSTERS, dimensions))
+    queries = centroids[rng.integers(0, CLUSTERS, query_count)] + rng.normal(scale=0.6, size=(query_count, dimensions))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    conn = psycopg2.connect(database_url)
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+            # Unqualified names (documents, match_documents) now resolve to the scratch schema
+            cur.execute(f"SET search_path TO {BENCH_SCHEMA}, public")
+            cur.execute(build_setup_sql(dimensions, "vector", "none"))
+            cur.execute(build_match_documents_sql(dimensions, "vector", index_type))
+        conn.commit()
+
+        for rows in sizes:
+            with conn.cursor() as cur:
+                cur.execute("DROP INDEX IF EXISTS documents_embedding_idx")
+                cur.execute("TRUNCATE documents")
+            conn.commit()
+
+            start = time.perf_counter()
+            truth = load_and_score(conn, rows, centroids, queries, k, seed=rows)
+            load_seconds = time.perf_counter() - start
+            print(f"\n{rows} rows loaded in {load_seconds:.1f}s")
+
+            exact = summarize(*time_queries(conn, queries, k, exact=True), truth, k)
+            print(f"  sequential scan: {exact}")
+
+            build_seconds = None
+            indexed = None
+            if index_type != "none":
+                start = time.perf_counter()
+                with conn.cursor() as cur:
+                    cur.execute(build_index_sql(dimensions, "vector", index_type))
+                conn.commit()
+                build_seconds = time.perf_counter() - start
+                indexed = summarize(*time_queries(conn, queries, k, exact=False), truth, k)
+                print(f"  {index_type} index (built in {build_seconds:.1f}s): {indexed}")
+
+            results.append({
+                "rows": rows,
+                "dimensions": dimensions,
+                "index": index_type,
+                "ef_search": HNSW_EF_SEARCH if index_type == "hnsw" else None,
+                "probes": IVFFLAT_PROBES if index_type == "ivfflat" else None,
+                "load_seconds": round(load_seconds, 2),
+                "index_build_seconds": round(build_seconds, 2) if build_seconds is not None else None,
+                "sequential_scan": exact,
+                "indexed": indexed,
+            })
+    finally:
+        if not keep:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+            conn.commit()
+        conn.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pgvector ANN indexes for match_documents")
+    parser.add_argument("--database-url", default=None, help="Defaults to DATABASE_URL / the Supabase project")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Table sizes")
+    parser.add_argument("--dimensions", type=int, default=256, help="Vector size")
+    parser.add_argument("--index", choices=INDEX_TYPES, default="hnsw", help="Index to benchmark")
+    parser.add_argument("--queries", type=int, default=100, help="Queries per table size")
+    parser.add_argument("-k", type=int, default=10, help="match_count per query")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {BENCH_SCHEMA} schema afterwards")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.database_url or get_database_url(), args.rows, args.dimensions,
+                  args.index, args.queries, args.k, args.keep)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,300 @@
+"""
+Measure retrieval quality and latency against a labeled query set.
+
+Run from the backend root so the app package is importable:
+    python -m app.scripts.benchmark_retrieval [--engine numpy|store] [-k 1 3 5 10] [--json out.json]
+
+Each labeled query lists relevant passages; a retrieved chunk counts as
+relevant when it contains one of them, so the same labels work for any chunk
+size. recall@k is the share of a query's passages found in the top k, MRR
+uses the rank of the first relevant chunk, and latency percentiles are per
+query.
+
+--engine numpy splits and embeds the labeled corpus itself (so --chunk-size
+and --chunk-overlap can be compared) and ranks every query with one batched
+matrix product; --synthetic pads the corpus with perturbed copies of the real
+chunk vectors to measure quality and latency at scale. --engine store queries
+the configured vector store through the app's hybrid retrieval: latency is
+timed one query at a time, and the whole set is also run as one batch for
+batch_queries_per_second.
+Set EMBEDDING_PROVIDER=hashed to run without network.
+
+--baseline compares against the JSON of an earlier run, e.g. the last commit.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_community.document_loaders import DirectoryLoader, TextLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.embeddings import EMBEDDING_PROVIDER, create_embeddings, embedding_model_id
+from app.services.metrics import RollingHistogram
+
+# Elements of the score matrix (queries x rows) computed at once when ranking, to bound memory on large corpora
+SCORE_BLOCK_ELEMENTS = 50_000_000
+
+
+def load_labels(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def relevance(chunk_texts: List[str], labels: List[dict]) -> List[List[set]]:
+    """For each query, the indices of the passages each chunk contains (empty set = not relevant)."""
+    lowered = [text.lower() for text in chunk_texts]
+    return [
+        [{i for i, passage in enumerate(label["relevant"]) if passage.lower() in text} for text in lowered]
+        for label in labels
+    ]
+
+
+def findable_passages(matches: List[List[set]]) -> List[set]:
+    """Per query, the passages that occur in at least one chunk."""
+    return [set().union(*chunk_matches) if chunk_matches else set() for chunk_matches in matches]
+
+
+def score_rankings(rankings: List[List[int]], matches: List[List[set]], findable_sets: List[set],
+                   labels: List[dict], ks: List[int]) -> dict:
+    """
+    recall@k and MRR over the queries whose passages occur somewhere in the corpus.
+
+    rankings index into matches, which says which passages each ranked chunk contains.
+    """
+    per_query = []
+    for label, ranking, chunk_matches, findable in zip(labels, rankings, matches, findable_sets):
+        result = {"query": label["query"], "answerable": bool(findable), "first_relevant_rank": None}
+        found = set()
+        for rank, index in enumerate(ranking, start=1):
+            hit = chunk_matches[index] if index < len(chunk_matches) else set()
+            if hit and result["first_relevant_rank"] is None:
+                result["first_relevant_rank"] = rank
+            found |= hit
+            if rank in ks and findable:
+                result[f"recall@{rank}"] = len(found) / len(findable)
+        for k in ks:
+            if findable and f"recall@{k}" not in result:
+                # Fewer than k results came back
+                result[f"recall@{k}"] = len(found) / len(findable)
+        per_query.append(result)
+
+    answerable = [r for r in per_query if r["answerable"]]
+    metrics = {f"recall@{k}": _mean([r[f"recall@{k}"] for r in answerable]) for k in ks}
+    metrics[f"mrr@{max(ks)}"] = _mean([1 / r["first_relevant_rank"] if r["first_relevant_rank"] else 0.0 for r in answerable])
+    return {"metrics": metrics, "per_query": per_query, "answerable": len(answerable)}
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return round(float(np.mean(values)), 4) if values else None
+
+
+def split_corpus(directory: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    documents = DirectoryLoader(directory, glob="**/*.txt", loader_cls=TextLoader).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return [chunk.page_content for chunk in splitter.split_documents(documents)]
+
+
+def synthetic_rows(vectors: np.ndarray, rows: int, noise: float, seed: int = 0) -> np.ndarray:
+    """Unit vectors scattered around random real chunks; never relevant, but close enough to compete."""
+    rng = np.random.default_rng(seed)
+    out = np.empty((rows, vectors.shape[1]), dtype=np.float32)
+    block = max(1, SCORE_BLOCK_ELEMENTS // (4 * vectors.shape[1]))
+    for start in range(0, rows, block):
+        end = min(start + block, rows)
+        base = vectors[rng.integers(0, len(vectors), end - start)]
+        jitter = rng.standard_normal(base.shape, dtype=np.float32) * (noise / np.sqrt(vectors.shape[1]))
+        mixed = base + jitter
+        out[start:end] = mixed / np.linalg.norm(mixed, axis=1, keepdims=True)
+    return out
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest inner products per query, best first, scored in row blocks."""
+    k = min(k, corpus.shape[0])
+    block = max(1, SCORE_BLOCK_ELEMENTS // corpus.shape[0])
+    results = []
+    for start in range(0, len(queries), block):
+        scores = queries[start:start + block] @ corpus.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        results.append(np.take_along_axis(top, order, axis=1))
+    return np.concatenate(results)
+
+
+def run_numpy(args, labels: List[dict], ks: List[int]) -> dict:
+    chunk_texts = split_corpus(args.directory, args.chunk_size, args.chunk_overlap)
+    embeddings = create_embeddings()
+
+    start = time.perf_counter()
+    chunk_vectors = np.asarray(embeddings.embed_documents(chunk_texts), dtype=np.float32)
+    embed_seconds = time.perf_counter() - start
+    query_vectors = np.asarray(embeddings.embed_documents([label["query"] for label in labels]), dtype=np.float32)
+
+    corpus = chunk_vectors
+    if args.synthetic:
+        corpus = np.concatenate([chunk_vectors, synthetic_rows(chunk_vectors, args.synthetic, args.noise)])
+
+    start = time.perf_counter()
+    rankings = top_k(corpus, query_vectors, max(ks))
+    batch_seconds = time.perf_counter() - start
+
+    latency = RollingHistogram(window=len(labels) * args.repeats)
+    for _ in range(args.repeats):
+        for vector in query_vectors:
+            start = time.perf_counter()
+            top_k(corpus, vector[None, :], max(ks))
+            latency.record(time.perf_counter() - start)
+
+    matches = relevance(chunk_texts, labels)
+    result = score_rankings(rankings.tolist(), matches, findable_passages(matches), labels, ks)
+    result["corpus"] = {
+        "chunks": len(chunk_texts),
+        "synthetic_rows": args.synthetic,
+        "rows": int(corpus.shape[0]),
+        "dimensions": int(corpus.shape[1]),
+        "chunk_size": args.chunk_size,
+        "chunk_overlap": args.chunk_overlap,
+        "embed_chunks_per_second": round(len(chunk_texts) / embed_seconds, 1) if embed_seconds else None,
+    }
+    result["latency"] = latency.summary()
+    result["batch_queries_per_second"] = round(len(labels) / batch_seconds, 1) if batch_seconds else None
+    return result
+
+
+async def run_store(args, labels: List[dict], ks: List[int]) -> dict:
+    # Imported here: the app module needs the API keys and Supabase settings
+    from app.api.chat_doubt import DEFAULT_EXAM, corpora, load_corpus_documents, retrieval_filter
+    from app.services.embeddings import get_embeddings
+    from app.services.retrieval import RETRIEVAL_CANDIDATES, batch_hybrid_search, hybrid_search
+
+    exam = args.exam or DEFAULT_EXAM
+    manager = await corpora.get(exam)
+    store = await manager.get()
+    lexical_index = None if args.vector_only else manager.lexical_index
+    metadata_filter = retrieval_filter({"exam": exam})
+    query_vectors = await get_embeddings().aembed_documents([label["query"] for label in labels])
+
+    k = max(ks)
+    candidates = max(RETRIEVAL_CANDIDATES, k)
+    queries = [label["query"] for label in labels]
+    start = time.perf_counter()
+    results = await batch_hybrid_search(
+        store, lexical_index, queries, query_vectors, k=k, candidates=candidates, metadata_filter=metadata_filter
+    )
+    batch_seconds = time.perf_counter() - start
+
+    latency = RollingHistogram(window=len(labels) * args.repeats)
+    for _ in range(args.repeats):
+        for query, vector in zip(queries, query_vectors):
+            start = time.perf_counter()
+            await hybrid_search(
+                store, lexical_index, query, vector, k=k, candidates=candidates, metadata_filter=metadata_filter
+            )
+            latency.record(time.perf_counter() - start)
+    retrieved = [[doc.page_content for doc in result.documents] for result in results]
+
+    rankings, matches = [], []
+    for texts, label in zip(retrieved, labels):
+        rankings.append(list(range(len(texts))))
+        matches.append(relevance(texts, [label])[0])
+    # Which passages the store holds at all; if it can't be enumerated, only what was retrieved is known
+    corpus = await asyncio.to_thread(load_corpus_documents, store, exam)
+    if corpus is not None:
+        findable = findable_passages(relevance([doc.page_content for doc in corpus], labels))
+    else:
+        findable = findable_passages(matches)
+    result = score_rankings(rankings, matches, findable, labels, ks)
+    result["corpus"] = {
+        "exam": exam,
+        "store": manager.status(),
+        "hybrid": lexical_index is not None,
+        "recall_denominator": "corpus" if corpus is not None else "retrieved",
+    }
+    result["latency"] = latency.summary()
+    result["batch_queries_per_second"] = round(len(labels) / batch_seconds, 1) if batch_seconds else None
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline_path: str) -> Dict[str, Optional[float]]:
+    """Change of every metric and latency percentile against an earlier report."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    deltas = {}
+    for name, value in report["metrics"].items():
+        before = baseline.get("metrics", {}).get(name)
+        deltas[name] = round(value - before, 4) if value is not None and before is not None else None
+    for name in ("p50_ms", "p95_ms", "p99_ms"):
+        value, before = report["latency"].get(name), baseline.get("latency", {}).get(name)
+        deltas[name] = round(value - before, 3) if value is not None and before is not None else None
+    return deltas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and latency")
+    parser.add_argument("--labels", default="./data/benchmarks/ssc_cgl_retrieval.json", help="Labeled query set")
+    parser.add_argument("--engine", choices=["numpy", "store"], default="numpy", help="What to search")
+    parser.add_argument("--directory", help="Corpus for --engine numpy (default: the one named in the labels)")
+    parser.add_argument("-k", type=int, nargs="+", default=[1, 3, 5, 10], help="Cutoffs for recall")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Splitter chunk size for --engine numpy")
+    parser.add_argument("--chunk-overlap", type=int, default=50, help="Splitter overlap for --engine numpy")
+    parser.add_argument("--synthetic", type=int, default=0, help="Distractor rows added for --engine numpy")
+    parser.add_argument("--noise", type=float, default=2.0, help="How far distractors scatter from real chunks")
+    parser.add_argument("--vector-only", action="store_true", help="Skip the BM25 leg for --engine store")
+    parser.add_argument("--exam", help="Corpus queried by --engine store (default: the first of EXAMS)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the queries")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    label_set = load_labels(args.labels)
+    labels = label_set["queries"]
+    args.directory = args.directory or label_set["corpus"]
+    ks = sorted(set(args.k))
+    if args.engine == "store" and args.synthetic:
+        parser.error("--synthetic only applies to --engine numpy")
+
+    if args.engine == "numpy":
+        result = run_numpy(args, labels, ks)
+    else:
+        result = asyncio.run(run_store(args, labels, ks))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "engine": args.engine,
+        "embedding_provider": EMBEDDING_PROVIDER,
+        "embedding_model": embedding_model_id(create_embeddings()),
+        "labels": args.labels,
+        "queries": len(labels),
+        **result,
+    }
+    if args.baseline:
+        report["delta"] = compare(report, args.baseline)
+
+    latency = report["latency"]
+    print(f"{report['queries']} queries ({report['answerable']} answerable), engine {args.engine}, "
+          f"{report['embedding_model']}")
+    for name, value in report["metrics"].items():
+        change = report.get("delta", {}).get(name)
+        print(f"{name:>10} {value if value is not None else '-':>8}" + (f"  ({change:+.4f})" if change is not None else ""))
+    print(f"{'latency':>10} p50 {latency['p50_ms']:.3f}ms  p95 {latency['p95_ms']:.3f}ms  p99 {latency['p99_ms']:.3f}ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,54 @@
+"""
+Ingest study material into the vector store.
+
+Run from the backend root so the app package is importable:
+    python -m app.scripts.ingest_documents [directory] [--backend supabase|faiss] [--exam ssc_cgl] [--full]
+
+Reads .txt files and PDFs (page by page, in parallel processes; --ocr for scans).
+
+Re-runs only embed what changed since the last run (see app/services/ingest_manifest.py).
+
+Try embedding throughput offline with a stub API, without writing anything:
+    python -m app.scripts.ingest_documents --dry-run --full --concurrency 8
+"""
+import argparse
 import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+import psycopg2
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders import TextLoader, DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import SupabaseVectorStore
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS, SupabaseVectorStore
 from supabase.client import create_client
 
+from app.scripts.setup_supabase import ANN_INDEX_TYPE, build_index_sql, can_index, get_database_url
+from app.services.document_loading import SUPPORTED_EXTENSIONS, load_pages, load_tasks
+from app.services.embedding_cache import CachedEmbeddings
+from app.services.embeddings import (
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_RPM,
+    EMBEDDING_STORAGE,
+    EMBEDDING_TPM,
+    create_embeddings,
+    embedding_dimensions,
+    embedding_model_id,
+)
+from app.services.faiss_store import exam_index_dir, load_faiss_index, read_index_meta, save_faiss_index
+from app.services.ingest_manifest import FilePlanner, IngestManifest, manifest_path
+from app.services.ingest_pipeline import StageStats, batched, buffered, concurrent_map
+from app.services.pgvector_loader import PgvectorCopyLoader
+from app.services.rate_limited_embeddings import RateLimitedEmbeddings
+from app.services.rate_limiter import RateLimiter
+from app.services.stub_embeddings import StubEmbeddings
+from app.utils.hashing import corpus_fingerprint, file_sha256
+from app.utils.tokens import count_tokens
+
 # Load environment variables
 load_dotenv()
 
@@ -14,11 +57,318 @@ supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
 supabase = create_client(supabase_url, supabase_key)
 
-# Initialize OpenAI embeddings
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+# Initialize OpenAI embeddings; every embedding request of the run shares the per-minute budgets
+rate_limiter = RateLimiter(EMBEDDING_RPM, EMBEDDING_TPM)
+embeddings = create_embeddings(EMBEDDING_DIMENSIONS, rate_limiter=rate_limiter)
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+# Chunks per embedding request and per upsert
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+# Processes parsing PDFs (default: one per core) and whether scanned pages are OCRed (needs Tesseract)
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "0")) or os.cpu_count() or 1
+INGEST_PDF_OCR = os.getenv("INGEST_PDF_OCR", "false").lower() == "true"
+# Embedding requests in flight at once
+EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+# Items (files, or batches of chunks) each pipeline stage may work ahead of the next one
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+# How rows reach Supabase: "rest" (upserts through the API) or "copy" (COPY over a direct
+# Postgres connection, see app/services/pgvector_loader.py; much faster for large corpora)
+INGEST_LOADER = os.getenv("INGEST_LOADER", "rest").lower()
+# Row ids per DELETE request (they end up in the URL query string)
+DELETE_BATCH_SIZE = 100
+
+def tag_documents(documents, directory_path, exam):
+    """
+    Add the metadata doubts can be filtered on: the exam, and a topic taken from
+    the first sub-folder (e.g. quant/percentages.txt -> quant) or, for files at
+    the top level, the file name.
+    """
+    for doc in documents:
+        relative = os.path.relpath(doc.metadata.get("source", ""), directory_path)
+        parts = relative.split(os.sep)
+        doc.metadata["exam"] = exam
+        doc.metadata.setdefault("topic", parts[0] if len(parts) > 1 else os.path.splitext(parts[0])[0])
+
+@dataclass
+class IngestRun:
+    """What the pipeline stages found, read back once they have all finished."""
+    stats: dict
+    present: set = field(default_factory=set)
+    unchanged_files: int = 0
+    touched: bool = False
+    # New manifest records of the files that were (re-)ingested
+    records: dict = field(default_factory=dict)
+    # Row ids no longer produced by modified files
+    removed: list = field(default_factory=list)
+    kept_chunks: int = 0
+    # Pages read from a text layer, recognised with OCR, or left empty (e.g. scans without --ocr)
+    page_origins: Counter = field(default_factory=Counter)
+
+def discover_files(directory_path):
+    """(path relative to the directory, path) of every .txt and .pdf file below it, in a stable order."""
+    root = Path(directory_path)
+    for path in sorted(root.rglob("*")):
+        if path.suffix.lower() in SUPPORTED_EXTENSIONS and path.is_file():
+            yield path.relative_to(root).as_posix(), path
+
+def changed_files(directory_path, manifest, run):
+    """Discover stage: new and modified files, skipping unchanged ones by mtime and size, then content hash."""
+    stats = run.stats["discover"]
+    for relative, path in discover_files(directory_path):
+        with stats.timed():
+            run.present.add(relative)
+            stats.add()
+            stat = path.stat()
+            if manifest.is_unchanged(relative, stat):
+                run.unchanged_files += 1
+                continue
+            content_hash = file_sha256(path)
+            previous = manifest.files.get(relative)
+            if previous is not None and previous.content_hash == content_hash:
+                # Touched but not edited: remember the new mtime so it isn't read again
+                previous.mtime, previous.size = stat.st_mtime, stat.st_size
+                run.unchanged_files += 1
+                run.touched = True
+                continue
+        yield relative, path, stat, content_hash, previous
+
+def load_chunks(files, directory_path, exam, text_splitter, pool, workers, ocr, run):
+    """
+    Load and split stages: the chunks to embed, with their row ids.
+    
+    Files are parsed in the process pool in tasks of up to PAGES_PER_TASK PDF
+    pages, `workers * 2` tasks at a time, so one long PDF keeps every core
+    busy. Pages come back in order and are split one at a time; a chunk never
+    spans two pages, so its page number is exact. Chunks are handed on as soon
+    as their pages are split, so memory doesn't grow with the size of a file.
+    """
+    pending = {}
+    
+    def tasks():
+        for file in files:
+            relative, path = file[0], file[1]
+            pending[relative] = file
+            yield from load_tasks(relative, str(path))
+    
+    def finish(planner):
+        _, _, stat, content_hash, _ = pending.pop(planner.path)
+        plan = planner.finish(stat, content_hash)
+        run.records[plan.path] = plan.record
+        run.removed += plan.removed
+        run.kept_chunks += plan.unchanged
+    
+    results = concurrent_map(partial(load_pages, ocr=ocr), tasks(), workers * 2, executor=pool)
+    planner = None
+    while True:
+        with run.stats["load"].timed():
+            result = next(results, None)
+        if result is None:
+            break
+        relative, pages = result
+        if planner is None or relative != planner.path:
+            if planner is not None:
+                finish(planner)
+            planner = FilePlanner(relative, exam, pending[relative][4])
+        run.stats["load"].add(len(pages))
+        for page in pages:
+            run.page_origins[page.origin] += 1
+        
+        with run.stats["split"].timed():
+            documents = []
+            for page in pages:
+                metadata = {"source": str(pending[relative][1])}
+                if page.number is not None:
+                    metadata["page"] = page.number
+                documents.append(Document(page_content=page.text, metadata=metadata))
+            tag_documents(documents, directory_path, exam)
+            split = text_splitter.split_documents(documents)
+            new_chunks = []
+            for chunk in split:
+                # Stored with each chunk so the API can budget prompt tokens without re-tokenizing
+                chunk.metadata["token_count"] = count_tokens(chunk.page_content)
+                row_id = planner.add(chunk)
+                if row_id is not None:
+                    new_chunks.append((chunk, row_id))
+        run.stats["split"].add(len(split))
+        yield from new_chunks
+    if planner is not None:
+        finish(planner)
+
+def embed_batches(chunks, batch_size, concurrency, embedder, run):
+    """Embed stage: (documents, row ids, vectors) per batch of chunks, `concurrency` batches at a time, in order."""
+    stats = run.stats["embed"]
+    
+    def embed(batch):
+        documents = [doc for doc, _ in batch]
+        with stats.timed():
+            vectors = embedder.embed_documents([doc.page_content for doc in documents])
+        stats.add(len(vectors))
+        return documents, [row_id for _, row_id in batch], vectors
+    
+    return concurrent_map(embed, batched(chunks, batch_size), concurrency)
+
+class FaissWriter:
+    """Applies upserts and deletes to a persisted FAISS index, loading it on first change."""
+    
+    def __init__(self, index_dir, model_id, update_existing):
+        self.index_dir = index_dir
+        self.model_id = model_id
+        self.update_existing = update_existing
+        self.vector_store = None
+        self.changed = False
+    
+    def _store(self):
+        if self.vector_store is None and self.update_existing:
+            self.vector_store = load_faiss_index(self.index_dir, embeddings, mmap=False)
+        return self.vector_store
+    
+    def upsert(self, documents, ids, vectors):
+        text_embeddings = list(zip([doc.page_content for doc in documents], vectors))
+        metadatas = [doc.metadata for doc in documents]
+        store = self._store()
+        if store is None:
+            self.vector_store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+        else:
+            store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        self.changed = True
+    
+    def delete(self, ids):
+        store = self._store()
+        if store is None:
+            return
+        existing = set(store.index_to_docstore_id.values())
+        ids = [row_id for row_id in ids if row_id in existing]
+        if ids:
+            store.delete(ids)
+            self.changed = True
+    
+    def finish(self):
+        if not self.changed:
+            return
+        store = self.vector_store
+        documents = [store.docstore.search(store.index_to_docstore_id[i]) for i in range(len(store.index_to_docstore_id))]
+        Path(self.index_dir).parent.mkdir(parents=True, exist_ok=True)
+        save_faiss_index(store, self.index_dir, corpus_fingerprint(documents, self.model_id), self.model_id)
+        print(f"Updated FAISS index at {self.index_dir}")
+
+class SupabaseWriter:
+    """Upserts rows through the Supabase REST API and deletes them in batches."""
+    
+    def __init__(self):
+        self.vector_store = SupabaseVectorStore(
+            client=supabase,
+            embedding=embeddings,
+            table_name="documents",
+            query_name="match_documents"
+        )
+    
+    def upsert(self, documents, ids, vectors):
+        # Upserts, so rows left behind by an interrupted run are overwritten, not duplicated
+        self.vector_store.add_vectors(vectors, documents, ids=ids)
+    
+    def delete(self, ids):
+        # SupabaseVectorStore.delete issues one request per row
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            supabase.table("documents").delete().in_("id", ids[start:start + DELETE_BATCH_SIZE]).execute()
+    
+    def finish(self):
+        pass
+
+class CopyWriter:
+    """
+    Streams rows into documents with COPY over a direct Postgres connection
+    (DATABASE_URL or the Supabase project's database); nothing is visible
+    until finish() commits the whole run in one transaction.
+    """
+    
+    def __init__(self, exam, full, build_index, include_untagged=False):
+        self.conn = psycopg2.connect(get_database_url())
+        # After a full reset every id is new, so rows can go straight into the table
+        self.loader = PgvectorCopyLoader(self.conn, upsert=not full, storage=EMBEDDING_STORAGE)
+        if full:
+            # Also catches rows ingested without a manifest, as long as they carry the exam
+            self.loader.delete_matching({"exam": exam})
+            if include_untagged:
+                self.loader.delete_missing_key("exam")
+        self.index_sql = None
+        if build_index:
+            dimensions = embedding_dimensions()
+            if can_index(dimensions, EMBEDDING_STORAGE):
+                self.index_sql = build_index_sql(dimensions, EMBEDDING_STORAGE, ANN_INDEX_TYPE)
+            else:
+                print(f"WARNING: pgvector cannot index {EMBEDDING_STORAGE}({dimensions}); not building an index")
+        # Only used for the test query once the rows are committed
+        self.vector_store = SupabaseVectorStore(
+            client=supabase,
+            embedding=embeddings,
+            table_name="documents",
+            query_name="match_documents"
+        )
+    
+    def upsert(self, documents, ids, vectors):
+        self.loader.copy(ids, [doc.page_content for doc in documents], [doc.metadata for doc in documents], vectors)
+    
+    def delete(self, ids):
+        self.loader.delete(ids)
+    
+    def finish(self):
+        start = time.perf_counter()
+        self.loader.commit(self.index_sql)
+        self.conn.close()
+        print(f"Committed {self.loader.copied} copied and {self.loader.deleted} deleted rows in "
+              f"{time.perf_counter() - start:.2f}s" + (" including the ANN index build" if self.index_sql else ""))
+
+class DryRunWriter:
+    """Discards everything, so a dry run measures the pipeline without touching the store."""
+    
+    vector_store = None
+    
+    def upsert(self, documents, ids, vectors):
+        pass
+    
+    def delete(self, ids):
+        pass
+    
+    def finish(self):
+        pass
 
-def ingest_documents(directory_path):
-    """Ingest documents from a directory into Supabase pgvector"""
+def ingest_documents(directory_path, backend="supabase", exam="ssc_cgl", manifest_file=None, full=False,
+                     batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY, dry_run=False,
+                     stub_latency_ms=300, stub_error_rate=0.0, loader=INGEST_LOADER, build_index=False,
+                     parse_workers=PARSE_WORKERS, ocr=INGEST_PDF_OCR, include_untagged=False):
+    """
+    Ingest documents from a directory into Supabase pgvector or a local FAISS index.
+    
+    Incremental: a manifest records each file's mtime, content hash and the
+    hash and row id of every chunk it produced, so only chunks of new or
+    modified files are embedded and upserted, and rows of deleted or modified
+    files are removed. An unchanged corpus costs one stat() per file.
+    Pass full=True to drop everything ingested for the exam and start over.
+    Rows written by the original ingester have no exam in their metadata, so
+    full=True leaves them alone unless include_untagged=True (pass it for the
+    exam they belong to) or they were tagged with backfill_exam_metadata.
+    
+    Files stream through discover -> load -> split -> embed -> upsert stages
+    with bounded queues in between, and chunks are embedded and written
+    batch_size at a time, so only a few batches are in memory at once.
+    Up to `concurrency` embedding requests run in parallel within the
+    EMBEDDING_RPM / EMBEDDING_TPM budgets; throttled and failed requests are
+    retried with backoff.
+    
+    .txt files are read whole; PDFs page by page in `parse_workers` processes,
+    with the page number in each chunk's metadata. With ocr=True pages that
+    have no text layer (scans) are OCRed through PyMuPDF, which needs Tesseract.
+    
+    With backend="supabase", loader="copy" writes rows with COPY in a single
+    transaction instead of through the REST API, and build_index=True
+    rebuilds the ANN index in that transaction once the rows are in.
+    
+    dry_run=True embeds with a local stub that imitates API latency (and,
+    with stub_error_rate, 429s) and writes nothing, neither to the store nor
+    to the manifest; compare runs with different `concurrency` to see how
+    throughput scales.
+    """
     
     # Check if directory exists
     if not os.path.exists(directory_path):
@@ -37,52 +387,137 @@ Tier I of SSC CGL includes sections on General Intelligence and Reasoning, Gener
 
 For Quantitative Aptitude in SSC CGL, important topics include: Number Systems, Percentage, Ratio & Proportion, Average, Interest, Profit and Loss, Discount, Mixture and Alligation, Time and Work, Time and Distance, Mensuration, Algebra, Geometry and Trigonometry, Data Interpretation.""")
     
-    # List files in directory
-    files = os.listdir(directory_path)
-    print(f"Found {len(files)} files in {directory_path}: {files}")
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+    model_id = embedding_model_id(embeddings)
+    # Changing any of these changes every chunk, so the manifest is discarded
+    settings = {
+        "backend": backend,
+        "exam": exam,
+        "embedding_model": model_id,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+    manifest = IngestManifest.load(manifest_file or manifest_path(backend, exam), settings)
+    if full:
+        manifest.stale_ids += manifest.row_ids()
+        manifest.files = {}
+    
+    embedder = embeddings
+    if dry_run:
+        stub = StubEmbeddings(latency_ms=stub_latency_ms, error_rate=stub_error_rate)
+        embedder = RateLimitedEmbeddings(stub, RateLimiter(EMBEDDING_RPM, EMBEDDING_TPM),
+                                         max_retries=EMBEDDING_MAX_RETRIES, base_delay=0.1)
+        writer = DryRunWriter()
+    elif backend == "faiss":
+        index_dir = exam_index_dir(exam)
+        meta = read_index_meta(index_dir)
+        update_index = bool(meta and meta.get("model") == model_id and manifest.files)
+        if not update_index:
+            # No usable index to update: build a new one from every file
+            manifest.files = {}
+            manifest.stale_ids = []
+        writer = FaissWriter(index_dir, model_id, update_index)
+    elif loader == "copy":
+        writer = CopyWriter(exam, full, build_index, include_untagged)
+        if full:
+            # Already deleted along with the rest of the exam's rows
+            manifest.stale_ids = []
+    else:
+        writer = SupabaseWriter()
+        if full:
+            # Also catches rows ingested without a manifest, as long as they carry the exam
+            supabase.table("documents").delete().contains("metadata", {"exam": exam}).execute()
+            if include_untagged:
+                supabase.table("documents").delete().is_("metadata->>exam", "null").execute()
+            manifest.stale_ids = []
+    
+    # Started before the pipeline threads, so forked workers don't inherit locks those threads hold
+    pool = ProcessPoolExecutor(max_workers=parse_workers)
+    pool.submit(int).result()
+    
+    run = IngestRun(stats={
+        "discover": StageStats("discover", "files"),
+        "load": StageStats("load", "docs"),
+        "split": StageStats("split", "chunks"),
+        "embed": StageStats("embed", "vectors"),
+        "upsert": StageStats("upsert", "rows"),
+    })
+    started = time.perf_counter()
     
-    # Load documents from directory
     try:
-        loader = DirectoryLoader(
-            directory_path, 
-            glob="**/*.txt", 
-            loader_cls=TextLoader
-        )
-        documents = loader.load()
-        print(f"Loaded {len(documents)} documents")
+        # Each stage runs in its own thread and hands items on through a bounded
+        # queue, so memory stays flat however large the corpus and stages overlap
+        files = buffered(changed_files(directory_path, manifest, run), QUEUE_SIZE, "discover")
+        chunks = buffered(load_chunks(files, directory_path, exam, text_splitter, pool, parse_workers, ocr, run),
+                          QUEUE_SIZE * batch_size, "split")
+        batches = buffered(embed_batches(chunks, batch_size, concurrency, embedder, run), QUEUE_SIZE, "embed")
         
-        if len(documents) == 0:
-            print("ERROR: No documents were loaded. Check if there are .txt files in the directory.")
-            return 0
+        # Ids only depend on content, so e.g. a model change re-embeds rows under their old ids
+        added_ids = set()
+        for documents, ids, vectors in batches:
+            with run.stats["upsert"].timed():
+                writer.upsert(documents, ids, vectors)
+            run.stats["upsert"].add(len(ids))
+            added_ids.update(ids)
         
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50
+        deleted = [relative for relative in manifest.files if relative not in run.present]
+        removed = list(manifest.stale_ids) + run.removed
+        removed += [chunk.id for relative in deleted for chunk in manifest.files[relative].chunks]
+        removed = [row_id for row_id in removed if row_id not in added_ids]
+        if removed:
+            writer.delete(removed)
+        writer.finish()
+        elapsed = time.perf_counter() - started
+        
+        print(
+            f"Files: {len(run.records)} new or modified, {len(deleted)} deleted, {run.unchanged_files} unchanged; "
+            f"chunks: {len(added_ids)} embedded, {len(removed)} removed, {run.kept_chunks} kept from modified files"
         )
-        chunks = text_splitter.split_documents(documents)
-        print(f"Split into {len(chunks)} chunks")
+        print("Stage throughput (time spent working, excluding waits on other stages):")
+        for stats in run.stats.values():
+            print(f"  {stats.summary()}")
+        print(f"  total     {elapsed:.2f}s wall time ({parse_workers} parse workers)")
+        if run.page_origins["ocr"] or run.page_origins["empty"]:
+            print(f"Pages: {run.page_origins['text']} with text, {run.page_origins['ocr']} OCRed, "
+                  f"{run.page_origins['empty']} without text" + ("" if ocr else " (scans? try --ocr)"))
+        limiter_stats = embedder.stats() if isinstance(embedder, RateLimitedEmbeddings) else rate_limiter.stats()
+        if limiter_stats["acquired"]:
+            # Local providers and cache hits never reach the limiter
+            print(
+                f"Embedding requests: {limiter_stats['acquired']} at concurrency {concurrency}, "
+                f"{limiter_stats['waited_seconds']}s waiting on rate limits, {limiter_stats['pauses']} 429 pauses"
+                + (f", {limiter_stats['retries']} retries" if "retries" in limiter_stats else "")
+            )
+        if dry_run:
+            print("Dry run: nothing was written")
+            return manifest.chunk_count()
         
-        # Check the first chunk to make sure it has content
-        if chunks:
-            print(f"First chunk preview: {chunks[0].page_content[:100]}...")
-            print(f"First chunk metadata: {chunks[0].metadata}")
+        if not (added_ids or removed or run.touched):
+            print("Nothing to ingest")
+            return manifest.chunk_count()
         
-        # Store document chunks and embeddings in Supabase
-        vector_store = SupabaseVectorStore.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            client=supabase,
-            table_name="documents",
-            query_name="match_documents"
-        )
+        # Only recorded once the store has the changes, so a failed run is simply redone
+        for relative in deleted:
+            del manifest.files[relative]
+        manifest.files.update(run.records)
+        manifest.stale_ids = []
+        manifest.save()
+        print(f"{manifest.chunk_count()} chunks from {len(manifest.files)} files now ingested for {exam}")
         
-        print(f"Successfully ingested {len(chunks)} document chunks into Supabase")
+        cache_stats = embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None
+        if cache_stats:
+            print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+        
+        if not added_ids or writer.vector_store is None:
+            return manifest.chunk_count()
         
         # Verify ingestion worked by doing a test query
         print("\nVerifying ingestion with a test query...")
         try:
-            results = vector_store.similarity_search("SSC CGL syllabus", k=1)
+            results = writer.vector_store.similarity_search("SSC CGL syllabus", k=1)
             if results:
                 print(f"✅ Test query successful! Found: {results[0].page_content[:100]}...")
             else:
@@ -90,12 +525,53 @@ For Quantitative Aptitude in SSC CGL, important topics include: Number Systems,
         except Exception as e:
             print(f"❌ Test query failed with error: {str(e)}")
         
-        return len(chunks)
+        return manifest.chunk_count()
     
     except Exception as e:
         print(f"ERROR during document ingestion: {str(e)}")
         raise
+    finally:
+        pool.shutdown(cancel_futures=True)
 
 if __name__ == "__main__":
-    # Replace with the path to your documents
-    ingest_documents("./data/ssc_cgl_materials") 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ingest study material into the vector store")
+    parser.add_argument("directory", nargs="?", default="./data/ssc_cgl_materials",
+                        help="Directory containing the documents to ingest")
+    parser.add_argument("--backend", choices=["supabase", "faiss"],
+                        default=os.getenv("VECTOR_BACKEND", "supabase").lower(),
+                        help="Where to store the embeddings (default: VECTOR_BACKEND or supabase)")
+    parser.add_argument("--exam", default="ssc_cgl", help="Exam the material belongs to, stored in chunk metadata")
+    parser.add_argument("--manifest", help="Ingest manifest to use (default: INGEST_MANIFEST_DIR/<backend>_<exam>.json)")
+    parser.add_argument("--full", action="store_true",
+                        help="Remove everything ingested for the exam and ingest the directory from scratch")
+    parser.add_argument("--include-untagged", action="store_true",
+                        help="With --full: also remove rows without an exam in their metadata, left by the "
+                             "original ingester; pass it for the exam those rows belong to")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="Chunks per embedding request and upsert (default: INGEST_EMBED_BATCH_SIZE or 256)")
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY,
+                        help="Embedding requests in flight at once (default: INGEST_EMBED_CONCURRENCY or 4)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Embed with a local stub that imitates the API and write nothing")
+    parser.add_argument("--stub-latency-ms", type=float, default=300, help="Dry run: latency of each stub request")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0,
+                        help="Dry run: fraction of stub requests that fail with a 429")
+    parser.add_argument("--loader", choices=["rest", "copy"], default=INGEST_LOADER,
+                        help="Supabase only: write through the REST API or with COPY over a direct "
+                             "Postgres connection (default: INGEST_LOADER or rest)")
+    parser.add_argument("--build-index", action="store_true",
+                        help="With --loader copy: rebuild the ANN index after loading, in the same transaction")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS,
+                        help="Processes parsing PDF pages (default: INGEST_PARSE_WORKERS or one per core)")
+    parser.add_argument("--ocr", action="store_true", default=INGEST_PDF_OCR,
+                        help="OCR PDF pages without a text layer (needs Tesseract)")
+    args = parser.parse_args()
+    if args.include_untagged and not args.full:
+        parser.error("--include-untagged only applies with --full")
+    
+    ingest_documents(args.directory, backend=args.backend, exam=args.exam,
+                     manifest_file=args.manifest, full=args.full, batch_size=args.batch_size,
+                     concurrency=args.concurrency, dry_run=args.dry_run,
+                     stub_latency_ms=args.stub_latency_ms, stub_error_rate=args.stub_error_rate,
+                     loader=args.loader, build_index=args.build_index,
+                     parse_workers=args.parse_workers, ocr=args.ocr, include_untagged=args.include_untagged) 
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+Migrate the documents table to a different embedding size and/or column type.
+
+Run from the backend root so the app package is importable:
+    python -m app.scripts.migrate_embedding_dimensions --dimensions 1024 --storage halfvec --mode truncate
+
+Modes:
+  truncate  Keep the first N components of each stored vector and re-normalize.
+            text-embedding-3 models are trained so that this matches asking the
+            API for N dimensions, so nothing is re-embedded. Requires pgvector >= 0.7
+            (subvector, l2_normalize) and can only shrink vectors.
+  reembed   Embed every row's content again at the new size. Works for any
+            target size and model, but pays for the embeddings.
+
+The migration runs alongside the API:
+  1. A new embedding_migrated column is added (a catalog-only change).
+  2. It is filled in batches, each committed on its own, so only the rows of
+     the current batch are locked and doubt queries keep using the old column.
+  3. Its ANN index is built with CREATE INDEX CONCURRENTLY.
+  4. One short transaction fills rows added since step 2, drops the old
+     column and renames the new one and its index into place.
+An interrupted migration resumes from step 2 when run again with the same
+target. Don't ingest while it runs: content updated after its row was
+migrated would keep the old row's vector.
+
+The only downtime is after step 4: match_documents then takes vectors of the
+new size, so doubts fail until EMBEDDING_DIMENSIONS / EMBEDDING_STORAGE are
+set to the same values for the API and ingestion and the API is restarted.
+"""
+import argparse
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.scripts.setup_supabase import (
+    ANN_INDEX_TYPE,
+    STORAGE_TYPES,
+    build_create_index_sql,
+    build_match_documents_sql,
+    can_index,
+    get_database_url,
+)
+from app.services.embeddings import create_embeddings
+
+MIGRATED_COLUMN = "embedding_migrated"
+MIGRATED_INDEX = "documents_embedding_migrated_idx"
+# How long the final swap waits for running queries before giving up, so it
+# never queues every new query behind a slow one
+SWAP_LOCK_TIMEOUT = "10s"
+
+
+def vector_literal(vector):
+    return "[" + ",".join(repr(float(x)) for x in vector) + "]"
+
+
+def add_migrated_column(conn, dimensions, storage):
+    """Adds the new column, keeping one of the same type left by an interrupted run"""
+    target = f"{storage}({dimensions})"
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = 'documents'::regclass AND attname = %s AND NOT attisdropped
+        """, (MIGRATED_COLUMN,))
+        row = cur.fetchone()
+        if row and row[0] == target:
+            print(f"Resuming into the existing {MIGRATED_COLUMN} column")
+        else:
+            cur.execute(f"ALTER TABLE documents DROP COLUMN IF EXISTS {MIGRATED_COLUMN}")
+            cur.execute(f"ALTER TABLE documents ADD COLUMN {MIGRATED_COLUMN} {target}")
+    conn.commit()
+
+
+def truncate_batch(cur, dimensions, storage, batch_size, after):
+    """Truncates the next batch of rows in SQL; returns the ids it migrated"""
+    cur.execute(f"""
+        UPDATE documents
+        SET {MIGRATED_COLUMN} = l2_normalize(subvector(embedding::vector, 1, {dimensions}))::{storage}({dimensions})
+        WHERE id IN (
+            SELECT id FROM documents
+            WHERE id > %s AND {MIGRATED_COLUMN} IS NULL AND embedding IS NOT NULL
+            ORDER BY id LIMIT %s
+        )
+        RETURNING id
+    """, (after, batch_size))
+    return [row_id for row_id, in cur.fetchall()]
+
+
+def reembed_batch(conn, cur, embeddings, dimensions, storage, batch_size, after, commit=True):
+    """Embeds the next batch of rows again; returns the ids it migrated"""
+    cur.execute(f"""
+        SELECT id, content FROM documents
+        WHERE id > %s AND {MIGRATED_COLUMN} IS NULL
+        ORDER BY id LIMIT %s
+    """, (after, batch_size))
+    rows = cur.fetchall()
+    if not rows:
+        return []
+    if commit:
+        # Don't hold a transaction open across the embeddings call
+        conn.commit()
+    vectors = embeddings.embed_documents([content for _, content in rows])
+    execute_values(
+        cur,
+        f"UPDATE documents SET {MIGRATED_COLUMN} = data.embedding::{storage}({dimensions}) "
+        f"FROM (VALUES %s) AS data (id, embedding) WHERE documents.id = data.id::uuid",
+        [(str(row_id), vector_literal(vector)) for (row_id, _), vector in zip(rows, vectors)],
+    )
+    return [row_id for row_id, _ in rows]
+
+
+def fill_migrated_column(conn, dimensions, storage, mode, batch_size, embeddings=None, commit=True):
+    """
+    Fills the new column in id order, a batch at a time. With commit=True
+    every batch is its own transaction; otherwise the caller's transaction
+    is left open (the final swap uses this for the rows added meanwhile).
+    """
+    done = 0
+    after = "00000000-0000-0000-0000-000000000000"
+    with conn.cursor() as cur:
+        while True:
+            if mode == "truncate":
+                ids = truncate_batch(cur, dimensions, storage, batch_size, after)
+            else:
+                ids = reembed_batch(conn, cur, embeddings, dimensions, storage, batch_size, after, commit)
+            if commit:
+                conn.commit()
+            if not ids:
+                return done
+            after = str(max(ids))
+            done += len(ids)
+            if commit:
+                print(f"Migrated {done} rows")
+
+
+def build_migrated_index(conn, dimensions, storage, index_type):
+    """Builds the new column's ANN index without blocking reads or writes"""
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            # A failed concurrent build leaves an invalid index behind
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {MIGRATED_INDEX}")
+            print(f"Building {index_type} index...")
+            cur.execute(build_create_index_sql(dimensions, storage, index_type, column=MIGRATED_COLUMN,
+                                               name=MIGRATED_INDEX, concurrently=True))
+    finally:
+        conn.autocommit = False
+
+
+def swap_columns(conn, dimensions, storage, mode, index_type, batch_size, embeddings=None):
+    """Moves the new column into place in one short transaction"""
+    with conn.cursor() as cur:
+        cur.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+        # Reads continue; writes wait until the swap commits
+        cur.execute("LOCK TABLE documents IN EXCLUSIVE MODE")
+    late = fill_migrated_column(conn, dimensions, storage, mode, batch_size, embeddings, commit=False)
+    if late:
+        print(f"Migrated {late} rows added during the migration")
+    with conn.cursor() as cur:
+        # Drops the old index with it
+        cur.execute("ALTER TABLE documents DROP COLUMN embedding")
+        cur.execute(f"ALTER TABLE documents RENAME COLUMN {MIGRATED_COLUMN} TO embedding")
+        if index_type != "none":
+            cur.execute(f"ALTER INDEX {MIGRATED_INDEX} RENAME TO documents_embedding_idx")
+        cur.execute(build_match_documents_sql(dimensions, storage, index_type))
+        cur.execute("ANALYZE documents")
+    conn.commit()
+
+
+def migrate(dimensions, storage, mode, batch_size=None):
+    index_type = ANN_INDEX_TYPE if can_index(dimensions, storage) else "none"
+    # Truncating is cheap SQL; re-embedding is bounded by the embeddings API
+    batch_size = batch_size or (1000 if mode == "truncate" else 100)
+    embeddings = create_embeddings(dimensions) if mode == "reembed" else None
+
+    conn = psycopg2.connect(get_database_url())
+    try:
+        add_migrated_column(conn, dimensions, storage)
+        fill_migrated_column(conn, dimensions, storage, mode, batch_size, embeddings)
+        if index_type != "none":
+            build_migrated_index(conn, dimensions, storage, index_type)
+        swap_columns(conn, dimensions, storage, mode, index_type, batch_size, embeddings)
+    except psycopg2.errors.LockNotAvailable:
+        conn.rollback()
+        print(f"Could not lock documents within {SWAP_LOCK_TIMEOUT} for the final swap; "
+              f"run the migration again to retry (migrated rows are kept).")
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print(f"Migrated documents.embedding to {storage}({dimensions}).")
+    print(f"Now set EMBEDDING_DIMENSIONS={dimensions} and EMBEDDING_STORAGE={storage} and restart the API.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Change the embedding size/type of the documents table")
+    parser.add_argument("--dimensions", type=int, required=True, help="Target embedding size, e.g. 256/512/1024")
+    parser.add_argument("--storage", choices=STORAGE_TYPES, default="vector", help="Target column type")
+    parser.add_argument("--mode", choices=["truncate", "reembed"], default="truncate",
+                        help="Truncate stored vectors or re-embed the content")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Rows per committed batch (default 1000 for truncate, 100 for reembed)")
+    args = parser.parse_args()
+
+    migrate(args.dimensions, args.storage, args.mode, args.batch_size)
@@ -0,0 +1,172 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Minimum cosine similarity between two queries for one to reuse the other's answer
+DOUBT_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("DOUBT_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+DOUBT_CACHE_TTL_SECONDS = float(os.getenv("DOUBT_CACHE_TTL_SECONDS", "86400"))
+# 0 disables the cache
+DOUBT_CACHE_MAX_ENTRIES = int(os.getenv("DOUBT_CACHE_MAX_ENTRIES", "1000"))
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    chunk_ids: Tuple[str, ...]
+    generation: int
+    created_at: float
+    last_hit_at: float
+    hits: int = 0
+    # Metadata filter the answer was retrieved with; only reused for the same filter
+    metadata_filter: Optional[Dict[str, Any]] = None
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of generated answers, looked up by query embedding.
+
+    Query vectors live in one preallocated float32 matrix so a lookup is a
+    single matrix-vector product. When full, the least recently used entry
+    is replaced.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = DOUBT_CACHE_SIMILARITY_THRESHOLD,
+        ttl_seconds: float = DOUBT_CACHE_TTL_SECONDS,
+        max_entries: int = DOUBT_CACHE_MAX_ENTRIES,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[CachedAnswer]] = [None] * max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def lookup(
+        self,
+        query_embedding: List[float],
+        is_valid: Callable[[CachedAnswer], bool],
+        metadata_filter: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Tuple[CachedAnswer, float]]:
+        """
+        Returns the most similar cached answer above the threshold that was
+        retrieved with the same metadata filter and is neither expired nor
+        rejected by is_valid, with its similarity.
+        """
+        if not self.enabled or self._vectors is None:
+            self.misses += 1
+            return None
+
+        query = _normalize(query_embedding)
+        if query.shape[0] != self._vectors.shape[1]:
+            self.misses += 1
+            return None
+
+        similarities = self._vectors @ query
+        now = time.time()
+        for slot in np.argsort(-similarities):
+            similarity = float(similarities[slot])
+            if similarity < self.similarity_threshold:
+                break
+            entry = self._entries[slot]
+            if entry is None or (entry.metadata_filter or None) != (metadata_filter or None):
+                continue
+            if now - entry.created_at > self.ttl_seconds or not is_valid(entry):
+                self._remove(slot)
+                self.stale += 1
+                continue
+            entry.hits += 1
+            entry.last_hit_at = now
+            self.hits += 1
+            return entry, similarity
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        query_embedding: List[float],
+        query: str,
+        answer: str,
+        chunk_ids: Tuple[str, ...],
+        generation: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+    ):
+        if not self.enabled:
+            return
+
+        vector = _normalize(query_embedding)
+        if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+            # First entry (or the embedding model changed): size the matrix for this dimension
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._entries = [None] * self.max_entries
+
+        now = time.time()
+        metadata_filter = metadata_filter or None
+        slot = self._matching_slot(vector, metadata_filter)
+        if slot is None:
+            slot = self._free_slot()
+        self._vectors[slot] = vector
+        self._entries[slot] = CachedAnswer(
+            query=query,
+            answer=answer,
+            chunk_ids=chunk_ids,
+            generation=generation,
+            created_at=now,
+            last_hit_at=now,
+            metadata_filter=metadata_filter,
+        )
+
+    def clear(self):
+        self._vectors = None
+        self._entries = [None] * self.max_entries
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": sum(1 for entry in self._entries if entry is not None),
+            "max_entries": self.max_entries,
+            "similarity_threshold": self.similarity_threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_evictions": self.stale,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+    def _matching_slot(self, vector: np.ndarray, metadata_filter: Optional[Dict[str, Any]]) -> Optional[int]:
+        """Slot of an existing entry the new one would shadow, so it is replaced instead of duplicated."""
+        similarities = self._vectors @ vector
+        for slot in np.flatnonzero(similarities >= self.similarity_threshold):
+            entry = self._entries[slot]
+            if entry is not None and entry.metadata_filter == metadata_filter:
+                return int(slot)
+        return None
+
+    def _free_slot(self) -> int:
+        for slot, entry in enumerate(self._entries):
+            if entry is None:
+                return slot
+        return min(range(self.max_entries), key=lambda slot: self._entries[slot].last_hit_at)
+
+    def _remove(self, slot: int):
+        self._entries[slot] = None
+        self._vectors[slot] = 0.0
+
+
+def _normalize(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else array
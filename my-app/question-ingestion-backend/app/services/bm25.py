@@ -0,0 +1,78 @@
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.utils.metadata import matches_filter
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-memory inverted index scored with Okapi BM25.
+
+    Postings are stored per term as numpy arrays of (document index, term
+    frequency), so scoring a query only touches documents containing one of
+    its terms.
+    """
+
+    def __init__(self, documents: List[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for doc_index, doc in enumerate(documents):
+            counts = Counter(tokenize(doc.page_content))
+            lengths[doc_index] = sum(counts.values())
+            for term, tf in counts.items():
+                doc_ids, tfs = postings[term]
+                doc_ids.append(doc_index)
+                tfs.append(tf)
+
+        self._postings = {
+            term: (np.asarray(doc_ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (doc_ids, tfs) in postings.items()
+        }
+        doc_count = len(documents)
+        self._idf = {
+            term: float(np.log(1 + (doc_count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5)))
+            for term, (doc_ids, _) in self._postings.items()
+        }
+        average_length = float(lengths.mean()) if doc_count else 0.0
+        # Per-document part of the BM25 denominator, precomputed once
+        self._norm = k1 * (1 - b + b * lengths / (average_length or 1.0))
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search(
+        self, query: str, k: int, metadata_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Top k documents for the query with their BM25 scores, best first, optionally limited by metadata."""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, tfs = posting
+            scores[doc_ids] += self._idf[term] * tfs * (self.k1 + 1) / (tfs + self._norm[doc_ids])
+
+        matched = np.flatnonzero(scores)
+        if metadata_filter:
+            # Only documents that scored are checked, not the whole corpus
+            matched = matched[[matches_filter(self.documents[i].metadata, metadata_filter) for i in matched]]
+        if matched.size == 0:
+            return []
+        if matched.size > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        ranked = matched[np.argsort(-scores[matched])]
+        return [(self.documents[i], float(scores[i])) for i in ranked]
@@ -0,0 +1,107 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from app.utils.hashing import chunk_id
+from app.utils.tokens import count_tokens
+
+# Most tokens of retrieved text put into one prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Chunks whose cosine similarity to the query is below this are left out (the best chunk is always kept)
+CONTEXT_MIN_SIMILARITY = float(os.getenv("CONTEXT_MIN_SIMILARITY", "0.2"))
+# Allowance for the "[Document i - source - topic]" header and separators around each chunk
+CHUNK_OVERHEAD_TOKENS = 20
+# Shared text between two chunks shorter than this is treated as coincidence, not splitter overlap.
+# The splitter overlaps chunks by up to 50 characters; longer matches are still trimmed.
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 200
+
+
+@dataclass
+class PackedContext:
+    # Chunks that made it into the prompt, in rank order, unmodified
+    documents: List[Document]
+    # Their text with overlap against earlier chunks removed, aligned with documents
+    texts: List[str]
+    token_count: int
+    # How many retrieved chunks were left out, by reason
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+
+def overlap_length(first: str, second: str, max_chars: int = MAX_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of first that is also a prefix of second."""
+    for length in range(min(len(first), len(second), max_chars), 0, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+
+def _trim_overlap(text: str, packed: List[Document], source: Optional[str]) -> str:
+    """Removes text the chunk shares with neighbouring chunks of the same source already packed."""
+    for other in packed:
+        if source is None or other.metadata.get("source") != source:
+            continue
+        # other precedes this chunk in the file: drop the repeated start
+        overlap = overlap_length(other.page_content, text)
+        if overlap >= MIN_OVERLAP_CHARS:
+            text = text[overlap:]
+        # other follows this chunk: drop the repeated end
+        overlap = overlap_length(text, other.page_content)
+        if overlap >= MIN_OVERLAP_CHARS:
+            text = text[:-overlap]
+    return text.strip()
+
+
+def _chunk_tokens(doc: Document, text: str) -> int:
+    """Token count stored at ingest when available, scaled down if overlap was trimmed."""
+    stored = doc.metadata.get("token_count")
+    if stored is None:
+        return count_tokens(text)
+    if len(text) == len(doc.page_content):
+        return int(stored)
+    return -(-int(stored) * len(text) // max(len(doc.page_content), 1))
+
+
+def pack_context(
+    documents: List[Document],
+    similarities: Optional[Dict[str, float]] = None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    min_similarity: float = CONTEXT_MIN_SIMILARITY,
+) -> PackedContext:
+    """
+    Selects and trims ranked chunks for the prompt.
+
+    Chunks below the similarity cutoff are dropped, text repeated between
+    adjacent chunks of the same file is kept only once, and chunks are added
+    in rank order while they fit in the token budget. Chunks without a known
+    similarity (e.g. lexical-only hits) are not subject to the cutoff.
+    """
+    similarities = similarities or {}
+    packed: List[Document] = []
+    texts: List[str] = []
+    token_count = 0
+    dropped = {"low_relevance": 0, "duplicate": 0, "over_budget": 0}
+
+    for rank, doc in enumerate(documents):
+        similarity = similarities.get(chunk_id(doc))
+        if rank > 0 and similarity is not None and similarity < min_similarity:
+            dropped["low_relevance"] += 1
+            continue
+
+        text = _trim_overlap(doc.page_content, packed, doc.metadata.get("source"))
+        if not text:
+            dropped["duplicate"] += 1
+            continue
+
+        tokens = _chunk_tokens(doc, text) + CHUNK_OVERHEAD_TOKENS
+        if packed and token_count + tokens > token_budget:
+            dropped["over_budget"] += 1
+            continue
+
+        packed.append(doc)
+        texts.append(text)
+        token_count += tokens
+
+    return PackedContext(documents=packed, texts=texts, token_count=token_count, dropped=dropped)
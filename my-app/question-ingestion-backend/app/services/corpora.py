@@ -0,0 +1,167 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.vectorstores import VectorStore
+
+from app.services.bm25 import BM25Index
+from app.services.vector_store import VectorStoreManager, load_docstore_documents
+from app.utils.logging_config import logger
+
+# Estimated memory all loaded corpora may use together before the least recently used are unloaded (MB)
+CORPUS_MEMORY_BUDGET_MB = float(os.getenv("CORPUS_MEMORY_BUDGET_MB", "1024"))
+# Rough per-chunk cost of the Document object, docstore entry and BM25 postings on top of the text
+CHUNK_OVERHEAD_BYTES = 1024
+
+
+def estimate_corpus_bytes(store: VectorStore, lexical_index: Optional[BM25Index]) -> int:
+    """
+    Approximate memory held by a loaded corpus: FAISS vectors plus the chunk
+    text kept in the docstore and the lexical index. Remote stores (pgvector)
+    only count their lexical index.
+    """
+    total = 0
+    if isinstance(store, FAISS):
+        total += store.index.ntotal * store.index.d * 4
+    docstore_documents = load_docstore_documents(store) or []
+    for documents in (docstore_documents, lexical_index.documents if lexical_index else []):
+        total += sum(len(doc.page_content) + CHUNK_OVERHEAD_BYTES for doc in documents)
+    return total
+
+
+class CorpusRegistry:
+    """
+    Named corpora, e.g. one per exam, each behind its own VectorStoreManager.
+
+    A corpus is built on first use and kept in least-recently-used order.
+    When the estimated memory of all loaded corpora exceeds the budget, the
+    least recently used ones are unloaded (the one just used always stays);
+    they are rebuilt, usually from their persisted index, the next time they
+    are asked for. Requests already holding an unloaded store finish normally.
+    """
+
+    def __init__(
+        self,
+        manager_factory: Callable[[str], VectorStoreManager],
+        memory_budget_bytes: float = CORPUS_MEMORY_BUDGET_MB * 1024 * 1024,
+    ):
+        self._manager_factory = manager_factory
+        self.memory_budget_bytes = memory_budget_bytes
+        self._managers: "OrderedDict[str, VectorStoreManager]" = OrderedDict()
+        # Estimated size of each loaded corpus, with the generation it was measured at
+        self._sizes: Dict[str, Tuple[int, int]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    async def get(self, name: str) -> VectorStoreManager:
+        """The manager for a corpus, loading it (and unloading others) if needed."""
+        manager = self._managers.get(name)
+        if manager is not None:
+            self.hits += 1
+            self._managers.move_to_end(name)
+            # A background refresh may have grown the corpus since it was measured
+            if await self._update_size(name, manager):
+                await self._evict(keep=name)
+            return manager
+
+        async with self._locks.setdefault(name, asyncio.Lock()):
+            manager = self._managers.get(name)
+            if manager is None:
+                manager = self._manager_factory(name)
+                # Builds the store; a failure propagates and nothing is kept
+                await manager.get()
+                manager.start_refresh()
+                self._managers[name] = manager
+                self.loads += 1
+                await self._update_size(name, manager)
+                logger.info(f"Loaded corpus {name} (~{self._sizes[name][1] / 2**20:.1f} MB)")
+        self._managers.move_to_end(name)
+        await self._evict(keep=name)
+        return manager
+
+    def loaded(self, name: str) -> Optional[VectorStoreManager]:
+        """The manager for a corpus if it is loaded, without loading it or touching the LRU order."""
+        return self._managers.get(name)
+
+    async def preload(self, names: Iterable[str]):
+        """Load corpora ahead of the first request; failures are logged and retried on demand."""
+        for name in names:
+            try:
+                await self.get(name)
+            except Exception:
+                logger.exception(f"Preloading corpus {name} failed")
+
+    async def refresh(self, name: Optional[str] = None):
+        """Rebuild one corpus (loading it if needed) or every loaded corpus."""
+        if name is not None:
+            manager = await self.get(name)
+            await manager.refresh()
+            if await self._update_size(name, manager):
+                await self._evict(keep=name)
+            return
+        for loaded_name, manager in list(self._managers.items()):
+            await manager.refresh()
+            await self._update_size(loaded_name, manager)
+        await self._evict()
+
+    async def unload(self, name: Optional[str] = None):
+        """Drop one corpus, or all of them; they are rebuilt on next use."""
+        for loaded_name in [name] if name is not None else list(self._managers):
+            manager = self._managers.pop(loaded_name, None)
+            self._sizes.pop(loaded_name, None)
+            if manager is not None:
+                await manager.stop()
+
+    async def stop(self):
+        for manager in self._managers.values():
+            await manager.stop()
+
+    def memory_bytes(self) -> int:
+        return sum(size for _, size in self._sizes.values())
+
+    def chunk_count(self) -> Optional[int]:
+        """Chunks across loaded corpora, or None if none are loaded or countable."""
+        counts = [m.status()["chunk_count"] for m in self._managers.values()]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": {
+                name: {
+                    "estimated_mb": round(self._sizes.get(name, (0, 0))[1] / 2**20, 2),
+                    "chunk_count": manager.status()["chunk_count"],
+                    "generation": manager.generation,
+                }
+                for name, manager in self._managers.items()
+            },
+            "estimated_mb": round(self.memory_bytes() / 2**20, 2),
+            "budget_mb": round(self.memory_budget_bytes / 2**20, 2),
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+    async def _update_size(self, name: str, manager: VectorStoreManager) -> bool:
+        """Re-measures the corpus if it was rebuilt since; True if its recorded size changed."""
+        measured = self._sizes.get(name)
+        if measured is not None and measured[0] == manager.generation:
+            return False
+        store = await manager.get()
+        size = await asyncio.to_thread(estimate_corpus_bytes, store, manager.lexical_index)
+        self._sizes[name] = (manager.generation, size)
+        return measured is None or measured[1] != size
+
+    async def _evict(self, keep: Optional[str] = None):
+        while self.memory_bytes() > self.memory_budget_bytes and len(self._managers) > 1:
+            name = next(iter(self._managers))
+            if name == keep:
+                break
+            size = self._sizes.get(name, (0, 0))[1]
+            await self.unload(name)
+            self.evictions += 1
+            logger.info(f"Unloaded corpus {name} (~{size / 2**20:.1f} MB) to stay within the memory budget")
@@ -0,0 +1,68 @@
+import os
+from typing import List, NamedTuple, Optional, Tuple
+
+import fitz  # PyMuPDF
+from langchain_community.document_loaders import TextLoader
+
+# File types ingestion reads
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+# PDF pages per parsing task: enough to amortise opening the file, few enough
+# that one long PDF is spread over every worker
+PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
+# Resolution scanned pages are rendered at for OCR
+OCR_DPI = 300
+
+
+class Page(NamedTuple):
+    # 1-based page number, or None for formats without pages
+    number: Optional[int]
+    text: str
+    # "text" (text layer), "ocr" (recognised from the page image) or "empty"
+    origin: str
+
+
+def load_tasks(relative: str, path: str) -> List[Tuple[str, str, int, int]]:
+    """
+    Splits a file into (relative path, path, first page, end page) parsing
+    tasks. Text files and empty PDFs are a single task.
+    """
+    if path.lower().endswith(".pdf"):
+        with fitz.open(path) as doc:
+            count = doc.page_count
+        if count:
+            return [(relative, path, start, min(start + PAGES_PER_TASK, count))
+                    for start in range(0, count, PAGES_PER_TASK)]
+    return [(relative, path, 0, 0)]
+
+
+def load_pages(task: Tuple[str, str, int, int], ocr: bool = False) -> Tuple[str, List[Page]]:
+    """
+    Reads the pages of one task. Runs in worker processes, so it only takes
+    and returns plain picklable values.
+
+    Pages without a text layer (usually scans) are OCRed when `ocr` is set,
+    which needs Tesseract installed; otherwise they come back empty.
+    """
+    relative, path, start, stop = task
+    if not path.lower().endswith(".pdf"):
+        return relative, [Page(None, doc.page_content, "text") for doc in TextLoader(path).load()]
+
+    pages = []
+    with fitz.open(path) as doc:
+        for number in range(start, stop):
+            page = doc[number]
+            text = page.get_text()
+            origin = "text"
+            if not text.strip():
+                origin = "empty"
+                if ocr and page.get_images():
+                    try:
+                        textpage = page.get_textpage_ocr(dpi=OCR_DPI, full=True)
+                    except RuntimeError as e:
+                        raise RuntimeError(
+                            f"OCR of page {number + 1} of {relative} failed ({e}); install Tesseract or turn OCR off"
+                        ) from e
+                    text = page.get_text(textpage=textpage)
+                    origin = "ocr" if text.strip() else "empty"
+            pages.append(Page(number + 1, text, origin))
+    return relative, pages
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Coalesces concurrent aembed_query calls into batched embeddings requests.
+
+    A query waits at most max_wait_ms for others to join it; the batch is sent
+    early once it holds max_batch_size texts. Each caller gets its own vector
+    back, and identical texts in a batch are only embedded once. Document
+    embedding and the sync methods go straight to the underlying client.
+    """
+
+    def __init__(self, underlying: Embeddings, max_wait_ms: float = 5.0, max_batch_size: int = 64):
+        self.underlying = underlying
+        # Exposed so caches and index metadata key on the real model
+        self.model = getattr(underlying, "model", None) or type(underlying).__name__
+        self.dimensions = getattr(underlying, "dimensions", None)
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.queries = 0
+        self.requests = 0
+        self.largest_batch = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.underlying.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.queries += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queries": self.queries,
+            "requests": self.requests,
+            "average_batch_size": self.queries / self.requests if self.requests else None,
+            "largest_batch": self.largest_batch,
+        }
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            # Hold a reference until it finishes so the task isn't garbage collected
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.requests += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            vectors = await self.underlying.aembed_documents(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            # Callers that were cancelled while waiting are skipped
+            if not future.done():
+                future.set_result(by_text[text])
@@ -0,0 +1,176 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.utils.hashing import sha256_text
+from app.utils.logging_config import logger
+
+# Lookups are chunked to stay below SQLite's bound-parameter limit
+_LOOKUP_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings object with a persistent SQLite cache.
+
+    Vectors are stored as float32 blobs keyed by (model, dimensions, sha256(text)),
+    so unchanged texts are never sent to the embeddings API twice. The cache is
+    capped at max_entries and evicts least recently used rows.
+    """
+
+    def __init__(self, underlying: Embeddings, db_path: str, max_entries: int = 100_000):
+        self.underlying = underlying
+        self.model = getattr(underlying, "model", None) or type(underlying).__name__
+        self.dimensions = getattr(underlying, "dimensions", None)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+              model TEXT NOT NULL,
+              dimensions INTEGER NOT NULL,
+              text_hash TEXT NOT NULL,
+              vector BLOB NOT NULL,
+              last_access REAL NOT NULL,
+              PRIMARY KEY (model, dimensions, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access_idx ON embeddings (last_access)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._lookup(texts)
+        if missing:
+            miss_texts = list(missing)
+            new_vectors = self.underlying.embed_documents(miss_texts)
+            self._store(missing, new_vectors)
+            vectors.update(zip(miss_texts, new_vectors))
+        return [vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        vectors, missing = self._lookup([text])
+        if missing:
+            vector = self.underlying.embed_query(text)
+            self._store(missing, [vector])
+            return vector
+        return vectors[text]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # SQLite access is blocking, so keep it off the event loop
+        vectors, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            miss_texts = list(missing)
+            new_vectors = await self.underlying.aembed_documents(miss_texts)
+            await asyncio.to_thread(self._store, missing, new_vectors)
+            vectors.update(zip(miss_texts, new_vectors))
+        return [vectors[text] for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vectors, missing = await asyncio.to_thread(self._lookup, [text])
+        if missing:
+            vector = await self.underlying.aembed_query(text)
+            await asyncio.to_thread(self._store, missing, [vector])
+            return vector
+        return vectors[text]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model,
+            "dimensions": self.dimensions,
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "path": self._db_path,
+        }
+
+    def _lookup(self, texts: List[str]):
+        """
+        Returns (cached vectors by text, {missing text: hash}) for the unique texts given.
+        """
+        hashes = {text: sha256_text(text) for text in texts}
+        by_hash = {}
+        unique_hashes = list(set(hashes.values()))
+        now = time.time()
+
+        with self._lock:
+            for i in range(0, len(unique_hashes), _LOOKUP_BATCH):
+                batch = unique_hashes[i:i + _LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model, self.dimensions or 0, *batch],
+                ).fetchall()
+                by_hash.update(rows)
+
+            if by_hash:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    [(now, self.model, self.dimensions or 0, h) for h in by_hash],
+                )
+                self._conn.commit()
+
+        vectors = {}
+        missing = {}
+        for text, text_hash in hashes.items():
+            blob = by_hash.get(text_hash)
+            if blob is None:
+                missing[text] = text_hash
+            else:
+                vectors[text] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        miss_count = sum(1 for text in texts if text in missing)
+        self.hits += len(texts) - miss_count
+        self.misses += miss_count
+        return vectors, missing
+
+    def _store(self, missing: Dict[str, str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [
+            (self.model, self.dimensions or 0, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text_hash, vector in zip(missing.values(), vectors)
+        ]
+        with self._lock:
+            # Rows another caller stored meanwhile hold the same vector, so they are kept as they are
+            # and only new rows are counted
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, dimensions, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._entries += cursor.rowcount
+            if self._entries > self.max_entries:
+                self._evict(self._entries - self.max_entries)
+            self._conn.commit()
+
+    def _evict(self, count: int):
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (count,),
+        )
+        self.evictions += count
+        # Recounted rather than decremented: other processes sharing the file add rows too
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Embedding cache evicted {count} least recently used entries")
@@ -0,0 +1,150 @@
+import os
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from app.services.embedding_batcher import MicroBatchingEmbeddings
+from app.services.embedding_cache import CachedEmbeddings
+from app.services.hashed_embeddings import HashedNgramEmbeddings
+from app.services.rate_limited_embeddings import RateLimitedEmbeddings
+from app.services.rate_limiter import RateLimiter
+
+# Where embeddings come from: "openai", or "hashed" for local hashed n-gram vectors
+# (no network; for offline runs, CI and load tests, not for answer quality)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+
+DEFAULT_MODELS = {
+    "openai": "text-embedding-3-large",
+    "hashed": "hashed-ngram",
+}
+
+# Embedding model shared by ingestion and retrieval; both sides must agree on it
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_MODELS.get(EMBEDDING_PROVIDER, ""))
+
+# Output size requested from text-embedding-3 models (e.g. 256/512/1024); unset = model default
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS")) if os.getenv("EMBEDDING_DIMENSIONS") else None
+
+# Column type for stored embeddings: "vector" (float32) or "halfvec" (float16, half the size)
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "vector").lower()
+
+NATIVE_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+    "hashed-ngram": 384,
+}
+
+# Local embedding cache; set EMBEDDING_CACHE_PATH to an empty string to disable it
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./data/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000"))
+
+# Concurrent query embeddings are sent together: a query waits up to EMBEDDING_BATCH_WAIT_MS
+# for others (0 disables batching), and a batch is sent as soon as it has EMBEDDING_BATCH_MAX_SIZE
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+
+# Account limits for the embeddings API, enforced by bulk callers such as ingestion (0 = unlimited)
+EMBEDDING_RPM = float(os.getenv("EMBEDDING_RPM", "3000"))
+EMBEDDING_TPM = float(os.getenv("EMBEDDING_TPM", "1000000"))
+# Retries of a throttled (429) or failed (5xx) embeddings request before giving up
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "8"))
+
+_embeddings: Optional[Embeddings] = None
+
+
+def _openai_embeddings(dimensions: Optional[int], client_retries: bool) -> Embeddings:
+    if client_retries:
+        return OpenAIEmbeddings(model=EMBEDDING_MODEL, dimensions=dimensions)
+    return OpenAIEmbeddings(model=EMBEDDING_MODEL, dimensions=dimensions, max_retries=0)
+
+
+def _hashed_embeddings(dimensions: Optional[int], client_retries: bool) -> Embeddings:
+    return HashedNgramEmbeddings(dimensions=dimensions or NATIVE_DIMENSIONS["hashed-ngram"], model=EMBEDDING_MODEL)
+
+
+# Provider name -> factory taking the requested dimensions (None = model default) and whether
+# the client may retry failed requests itself
+EMBEDDING_PROVIDERS: Dict[str, Callable[[Optional[int], bool], Embeddings]] = {
+    "openai": _openai_embeddings,
+    "hashed": _hashed_embeddings,
+}
+
+# Providers computed in-process: batching and caching their vectors would only add overhead
+LOCAL_PROVIDERS = {"hashed"}
+
+
+def get_embeddings() -> Embeddings:
+    """
+    Returns the process-wide embeddings client used for both ingestion and querying.
+    """
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = create_embeddings(EMBEDDING_DIMENSIONS)
+    return _embeddings
+
+
+def create_embeddings(dimensions: Optional[int] = None, rate_limiter: Optional[RateLimiter] = None) -> Embeddings:
+    """
+    Builds a new (cached) embeddings client; only for callers that need a
+    dimension other than the configured one, such as the migration script,
+    or that send requests through a RateLimiter, such as ingestion.
+    """
+    if EMBEDDING_PROVIDER not in EMBEDDING_PROVIDERS:
+        raise ValueError(
+            f"Unknown EMBEDDING_PROVIDER {EMBEDDING_PROVIDER!r}; expected one of {', '.join(EMBEDDING_PROVIDERS)}"
+        )
+    # Behind a RateLimiter, RateLimitedEmbeddings is the only retry layer: the client's own
+    # retries would multiply its attempts and bypass the token buckets
+    embeddings = EMBEDDING_PROVIDERS[EMBEDDING_PROVIDER](dimensions, rate_limiter is None)
+    if EMBEDDING_PROVIDER in LOCAL_PROVIDERS:
+        return embeddings
+    if rate_limiter is not None:
+        # Innermost, so cache hits don't use up the budgets
+        embeddings = RateLimitedEmbeddings(embeddings, rate_limiter, max_retries=EMBEDDING_MAX_RETRIES)
+    if EMBEDDING_BATCH_WAIT_MS > 0:
+        # Inside the cache, so only cache misses wait for a batch
+        embeddings = MicroBatchingEmbeddings(
+            embeddings,
+            max_wait_ms=EMBEDDING_BATCH_WAIT_MS,
+            max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+        )
+    if EMBEDDING_CACHE_PATH:
+        embeddings = CachedEmbeddings(
+            embeddings,
+            db_path=EMBEDDING_CACHE_PATH,
+            max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        )
+    return embeddings
+
+
+def embedding_dimensions() -> int:
+    """Length of the vectors the configured model produces, for table and function DDL."""
+    if EMBEDDING_DIMENSIONS:
+        return EMBEDDING_DIMENSIONS
+    if EMBEDDING_MODEL not in NATIVE_DIMENSIONS:
+        raise ValueError(f"Unknown dimensions for {EMBEDDING_MODEL}; set EMBEDDING_DIMENSIONS")
+    return NATIVE_DIMENSIONS[EMBEDDING_MODEL]
+
+
+def embedding_cache_stats() -> Optional[Dict[str, Any]]:
+    """Hit/miss counters of the embedding cache, or None if caching is disabled."""
+    embeddings = get_embeddings()
+    return embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None
+
+
+def embedding_batcher_stats() -> Optional[Dict[str, Any]]:
+    """Batching counters for query embeddings, or None if batching is disabled."""
+    embeddings = get_embeddings()
+    if isinstance(embeddings, CachedEmbeddings):
+        embeddings = embeddings.underlying
+    return embeddings.stats() if isinstance(embeddings, MicroBatchingEmbeddings) else None
+
+
+def embedding_model_id(embeddings: Embeddings) -> str:
+    """
+    Identifies the vector space an embeddings object produces, for cache and index keys.
+    """
+    model = getattr(embeddings, "model", None) or type(embeddings).__name__
+    dimensions = getattr(embeddings, "dimensions", None)
+    return f"{model}:{dimensions}" if dimensions else model
@@ -0,0 +1,144 @@
+import json
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.services.embeddings import embedding_model_id
+from app.utils.hashing import corpus_fingerprint
+from app.utils.logging_config import logger
+
+# Root directory for persisted FAISS indexes; each corpus gets its own subdirectory
+FAISS_INDEX_DIR = os.getenv("FAISS_INDEX_DIR", "./data/faiss_index")
+
+# File names match FAISS.save_local / FAISS.load_local so indexes stay interchangeable
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+META_FILE = "meta.json"
+
+
+def exam_index_dir(exam: str) -> str:
+    """Directory of the FAISS index ingested for one exam's study material."""
+    return os.path.join(FAISS_INDEX_DIR, "exams", exam)
+
+
+def read_index_meta(index_dir: str) -> Optional[dict]:
+    """Returns the metadata saved next to an index, or None if there is no usable index."""
+    meta_path = Path(index_dir) / META_FILE
+    if not meta_path.exists() or not (Path(index_dir) / INDEX_FILE).exists():
+        return None
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable FAISS index metadata in {index_dir}: {str(e)}")
+        return None
+
+
+def _read_faiss_index(index_path: str, mmap: bool):
+    """Reads a FAISS index, memory-mapping it when the installed faiss supports it."""
+    if mmap:
+        # IO_FLAG_MMAP_IFC maps flat codes in place; older faiss only has IO_FLAG_MMAP
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None) or faiss.IO_FLAG_MMAP
+        try:
+            return faiss.read_index(index_path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            logger.warning(f"Memory-mapped read of {index_path} failed, loading into memory: {str(e)}")
+    return faiss.read_index(index_path)
+
+
+def load_faiss_index(index_dir: str, embeddings: Embeddings, mmap: bool = True) -> FAISS:
+    """
+    Loads a persisted index and its docstore.
+
+    With mmap=True the index is opened read-only; pass mmap=False if documents
+    will be added to or deleted from the returned store.
+    """
+    meta = read_index_meta(index_dir)
+    if meta is None:
+        raise FileNotFoundError(f"No FAISS index found in {index_dir}")
+
+    model_id = embedding_model_id(embeddings)
+    if meta.get("model") != model_id:
+        raise ValueError(
+            f"FAISS index in {index_dir} was built with {meta.get('model')}, not {model_id}"
+        )
+
+    index = _read_faiss_index(str(Path(index_dir) / INDEX_FILE), mmap)
+    with open(Path(index_dir) / DOCSTORE_FILE, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def save_faiss_index(vector_store: FAISS, index_dir: str, fingerprint: str, model_id: str):
+    """
+    Persists an index, docstore and metadata.
+
+    Files are written to a temporary directory first and swapped in, so a
+    crash mid-write never leaves a half-written index behind.
+    """
+    target = Path(index_dir)
+    tmp_dir = target.with_name(target.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+
+    vector_store.save_local(str(tmp_dir))
+    with open(tmp_dir / META_FILE, "w") as f:
+        json.dump({
+            "fingerprint": fingerprint,
+            "model": model_id,
+            "chunk_count": vector_store.index.ntotal,
+            "built_at": time.time(),
+        }, f, indent=2)
+
+    if target.exists():
+        shutil.rmtree(target)
+    tmp_dir.rename(target)
+
+
+def load_or_build_faiss_index(
+    documents: List[Document],
+    embeddings: Embeddings,
+    index_dir: str,
+    mmap: bool = True,
+) -> FAISS:
+    """
+    Returns a FAISS store for the given chunks, embedding them only if needed.
+
+    The saved index is reused as long as the chunk texts and the embedding
+    model are unchanged; otherwise it is rebuilt and saved again.
+    """
+    model_id = embedding_model_id(embeddings)
+    fingerprint = corpus_fingerprint(documents, model_id)
+
+    meta = read_index_meta(index_dir)
+    if meta and meta.get("fingerprint") == fingerprint:
+        try:
+            vector_store = load_faiss_index(index_dir, embeddings, mmap=mmap)
+            logger.info(f"Loaded persisted FAISS index from {index_dir} ({meta.get('chunk_count')} chunks)")
+            return vector_store
+        except Exception as e:
+            logger.warning(f"Could not load persisted FAISS index from {index_dir}, rebuilding: {str(e)}")
+
+    logger.info(f"Building FAISS index for {len(documents)} chunks in {index_dir}")
+    vector_store = FAISS.from_documents(documents=documents, embedding=embeddings)
+    try:
+        Path(index_dir).parent.mkdir(parents=True, exist_ok=True)
+        save_faiss_index(vector_store, index_dir, fingerprint, model_id)
+    except OSError as e:
+        # A read-only filesystem shouldn't take retrieval down with it
+        logger.warning(f"Could not persist FAISS index to {index_dir}: {str(e)}")
+    return vector_store
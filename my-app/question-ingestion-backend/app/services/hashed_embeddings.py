@@ -0,0 +1,58 @@
+import re
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_WORD = re.compile(r"\w+")
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """
+    Local, deterministic embeddings from hashed word and character n-grams.
+
+    Each word and each character n-gram of the (padded) words is hashed with
+    CRC32 into one of `dimensions` buckets with a hash-derived sign, and the
+    counts are L2-normalised. No network and no model weights: texts sharing
+    vocabulary get high cosine similarity, which is enough to exercise the
+    retrieval and indexing paths offline and at scale. Vectors are the same
+    in every process, so they can be cached and indexed like real ones.
+    """
+
+    def __init__(self, dimensions: int = 384, ngram_range: tuple = (3, 5), model: str = "hashed-ngram"):
+        self.model = model
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        low, high = self.ngram_range
+        for word in _WORD.findall(text.lower()):
+            features.append(word)
+            padded = f"<{word}>"
+            for n in range(low, min(high, len(padded)) + 1):
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embeds texts into a (len(texts), dimensions) float32 array."""
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)),
+                dtype=np.uint32,
+            )
+            if not hashes.size:
+                continue
+            # Low bits pick the bucket, the top bit the sign, so collisions tend to cancel out
+            signs = np.where(hashes >> 31, -1.0, 1.0)
+            vectors[row] = np.bincount(hashes % self.dimensions, weights=signs, minlength=self.dimensions)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
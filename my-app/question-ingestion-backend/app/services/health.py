@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.utils.logging_config import logger
+
+# How often the document count is refreshed in the background (seconds)
+HEALTH_REFRESH_SECONDS = float(os.getenv("HEALTH_REFRESH_SECONDS", "60"))
+
+
+class VectorStoreHealth:
+    """
+    Cached health of the document store, refreshed off the request path.
+
+    A background task periodically runs document_counter (which should use a
+    cheap, possibly approximate count) and the request path reports every
+    retrieval through record_retrieval(). Readers only ever see the cached
+    snapshot, so checking health never touches the database.
+    """
+
+    def __init__(
+        self,
+        document_counter: Callable[[], Optional[int]],
+        refresh_interval: float = HEALTH_REFRESH_SECONDS,
+    ):
+        self._document_counter = document_counter
+        self.refresh_interval = refresh_interval
+        self.document_count: Optional[int] = None
+        self._checked_at: Optional[float] = None
+        self._check_seconds: Optional[float] = None
+        self._check_error: Optional[str] = None
+        self._last_success_at: Optional[float] = None
+        self._last_retrieval_seconds: Optional[float] = None
+        self._last_failure_at: Optional[float] = None
+        self._last_retrieval_error: Optional[str] = None
+        self.retrievals = 0
+        self.retrieval_errors = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Take a first snapshot and start refreshing it, if configured."""
+        await self.refresh()
+        if self.refresh_interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def refresh(self):
+        """Re-count the documents; a failed count keeps the previous one."""
+        start_time = time.perf_counter()
+        try:
+            count = await asyncio.to_thread(self._document_counter)
+        except Exception as e:
+            self._check_error = str(e)
+            logger.warning(f"Document count failed: {e}")
+            return
+        self.document_count = count
+        self._checked_at = time.time()
+        self._check_seconds = time.perf_counter() - start_time
+        self._check_error = None
+
+    def record_retrieval(self, seconds: float, error: Optional[Exception] = None):
+        self.retrievals += 1
+        if error is None:
+            self._last_success_at = time.time()
+            self._last_retrieval_seconds = seconds
+        else:
+            self.retrieval_errors += 1
+            self._last_failure_at = time.time()
+            self._last_retrieval_error = str(error)
+
+    @property
+    def retrieval_working(self) -> Optional[bool]:
+        """Whether the most recent retrieval succeeded; None before the first one."""
+        if self._last_success_at is None and self._last_failure_at is None:
+            return None
+        return (self._last_success_at or 0) >= (self._last_failure_at or 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "document_count": self.document_count,
+            "document_count_age_seconds": now - self._checked_at if self._checked_at else None,
+            "document_count_seconds": self._check_seconds,
+            "document_count_error": self._check_error,
+            "retrieval_working": self.retrieval_working,
+            "last_successful_retrieval_at": self._last_success_at,
+            "last_retrieval_seconds": self._last_retrieval_seconds,
+            "last_retrieval_error": self._last_retrieval_error,
+            "retrievals": self.retrievals,
+            "retrieval_errors": self.retrieval_errors,
+            "refresh_interval_seconds": self.refresh_interval,
+        }
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from app.utils.hashing import document_hash
+from app.utils.logging_config import logger
+
+# Directory holding one manifest per backend and exam
+INGEST_MANIFEST_DIR = os.getenv("INGEST_MANIFEST_DIR", "./data/ingest_manifests")
+
+MANIFEST_VERSION = 1
+# Namespace for row ids, so re-ingesting the same chunk always upserts the same row
+ROW_ID_NAMESPACE = uuid.UUID("6f1d8a52-3c0e-4b8f-9a57-2d4e1c7b9f30")
+
+
+def manifest_path(backend: str, exam: str) -> str:
+    return os.path.join(INGEST_MANIFEST_DIR, f"{backend}_{exam}.json")
+
+
+def chunk_row_id(exam: str, path: str, chunk_hash: str, occurrence: int) -> str:
+    """
+    Deterministic row id for a chunk of a file.
+
+    `occurrence` tells identical chunks of the same file apart. Because the id
+    only depends on what is stored, a lost or stale manifest leads to
+    idempotent upserts rather than duplicate rows.
+    """
+    return str(uuid.uuid5(ROW_ID_NAMESPACE, f"{exam}\0{path}\0{chunk_hash}\0{occurrence}"))
+
+
+@dataclass
+class ChunkRecord:
+    hash: str
+    id: str
+
+
+@dataclass
+class FileRecord:
+    mtime: float
+    size: int
+    content_hash: str
+    chunks: List[ChunkRecord] = field(default_factory=list)
+
+
+@dataclass
+class FilePlan:
+    """What ingesting one new or modified file changed in the store, once all its chunks were seen."""
+    path: str
+    record: FileRecord
+    # Row ids no longer produced by the file
+    removed: List[str]
+    unchanged: int
+
+
+class FilePlanner:
+    """
+    Diffs a file's fresh chunks against the ones recorded for it last time,
+    one chunk at a time, so a large file never has to be held in memory:
+    add() says whether each chunk needs embedding as it is produced, and
+    finish() reports the rows the file no longer produces.
+    """
+
+    def __init__(self, path: str, exam: str, previous: Optional[FileRecord]):
+        self.path = path
+        self.exam = exam
+        self.previous_ids = {chunk.id for chunk in previous.chunks} if previous else set()
+        self.occurrences: Counter = Counter()
+        self.records: List[ChunkRecord] = []
+
+    def add(self, chunk: Document) -> Optional[str]:
+        """Records a chunk and returns its row id if it isn't stored yet (None if it is)."""
+        chunk_hash = document_hash(chunk)
+        row_id = chunk_row_id(self.exam, self.path, chunk_hash, self.occurrences[chunk_hash])
+        self.occurrences[chunk_hash] += 1
+        self.records.append(ChunkRecord(chunk_hash, row_id))
+        return None if row_id in self.previous_ids else row_id
+
+    def finish(self, stat: os.stat_result, content_hash: str) -> FilePlan:
+        current_ids = {record.id for record in self.records}
+        return FilePlan(
+            path=self.path,
+            record=FileRecord(stat.st_mtime, stat.st_size, content_hash, self.records),
+            removed=sorted(self.previous_ids - current_ids),
+            unchanged=len(current_ids & self.previous_ids),
+        )
+
+
+class IngestManifest:
+    """
+    What was ingested from a directory: per file (relative path) its mtime,
+    size, content hash and the hash and row id of each chunk it produced.
+
+    `settings` (embedding model, splitter parameters, ...) apply to every
+    chunk; when they differ from the saved ones the manifest starts empty and
+    every previously ingested row is reported in `stale_ids` for removal.
+    """
+
+    def __init__(self, path: str, settings: Dict[str, Any], files: Optional[Dict[str, FileRecord]] = None):
+        self.path = path
+        self.settings = settings
+        self.files: Dict[str, FileRecord] = files or {}
+        self.stale_ids: List[str] = []
+
+    @classmethod
+    def load(cls, path: str, settings: Dict[str, Any]) -> "IngestManifest":
+        manifest = cls(path, settings)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return manifest
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable ingest manifest {path}: {str(e)}")
+            return manifest
+
+        files = {
+            name: FileRecord(
+                mtime=record["mtime"],
+                size=record["size"],
+                content_hash=record["content_hash"],
+                chunks=[ChunkRecord(**chunk) for chunk in record.get("chunks", [])],
+            )
+            for name, record in data.get("files", {}).items()
+        }
+        if data.get("version") != MANIFEST_VERSION or data.get("settings") != settings:
+            logger.info(f"Ingest settings changed since {path} was written; re-ingesting everything")
+            manifest.stale_ids = [chunk.id for record in files.values() for chunk in record.chunks]
+            return manifest
+        manifest.files = files
+        return manifest
+
+    def is_unchanged(self, path: str, stat: os.stat_result) -> bool:
+        """True if the file looks untouched since it was ingested (same mtime and size)."""
+        record = self.files.get(path)
+        return record is not None and record.mtime == stat.st_mtime and record.size == stat.st_size
+
+    def row_ids(self) -> List[str]:
+        return [chunk.id for record in self.files.values() for chunk in record.chunks]
+
+    def chunk_count(self) -> int:
+        return sum(len(record.chunks) for record in self.files.values())
+
+    def save(self):
+        """Writes the manifest to a temporary file and renames it over the old one."""
+        target = Path(self.path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "version": MANIFEST_VERSION,
+                "settings": self.settings,
+                "updated_at": time.time(),
+                "files": {name: asdict(record) for name, record in sorted(self.files.items())},
+            }, f, indent=1)
+        os.replace(tmp_path, target)
@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class StageStats:
+    """
+    Items a pipeline stage produced and the time it spent working on them
+    (not waiting). When several threads work on a stage at once, overlapping
+    work is only counted once, so the rate is the stage's real throughput.
+    """
+
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.count = 0
+        self.busy_seconds = 0.0
+        self._active = 0
+        self._busy_since = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self):
+        with self._lock:
+            if self._active == 0:
+                self._busy_since = time.perf_counter()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                if self._active == 0:
+                    self.busy_seconds += time.perf_counter() - self._busy_since
+
+    def add(self, count: int = 1):
+        with self._lock:
+            self.count += count
+
+    def rate(self) -> float:
+        return self.count / self.busy_seconds if self.busy_seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.name:<9} {self.count:>9} {self.unit:<8} in {self.busy_seconds:8.2f}s "
+            f"({self.rate():,.1f} {self.unit}/s)"
+        )
+
+
+def buffered(iterable: Iterable[T], maxsize: int, name: str = "stage") -> Iterator[T]:
+    """
+    Runs `iterable` in its own thread and yields its items through a queue
+    of at most `maxsize` items, so the producer works ahead of the consumer
+    without ever holding more than that. Exceptions in the producer are
+    re-raised in the consumer; if the consumer stops early, the producer is
+    abandoned at its next put.
+    """
+    items: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+            return
+        put(_DONE)
+
+    threading.Thread(target=produce, name=f"ingest-{name}", daemon=True).start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Groups items into lists of `size` (the last one may be shorter)."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def concurrent_map(
+    function: Callable[[T], R],
+    items: Iterable[T],
+    concurrency: int,
+    executor: Optional[Executor] = None,
+) -> Iterator[R]:
+    """
+    Applies `function` to items on up to `concurrency` threads (or in the
+    given executor, e.g. a process pool), yielding the results in input
+    order. Only `concurrency` items are taken from `items` ahead of the
+    consumer; the first exception is re-raised.
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest-worker") as own:
+            yield from concurrent_map(function, items, concurrency, own)
+        return
+
+    in_flight: Deque[Future] = deque()
+    try:
+        for item in items:
+            if len(in_flight) >= concurrency:
+                yield in_flight.popleft().result()
+            in_flight.append(executor.submit(function, item))
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        for future in in_flight:
+            future.cancel()
@@ -0,0 +1,91 @@
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional
+
+import numpy as np
+
+# Most recent samples kept per stage
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "1000"))
+# Upper bounds (ms) of the histogram buckets reported per stage; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class RollingHistogram:
+    """Latency distribution over the last `window` samples."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds: float):
+        self._samples.append(seconds * 1000)
+        self.count += 1
+
+    def summary(self) -> Dict[str, Any]:
+        if not self._samples:
+            return {"count": self.count, "window": 0}
+        samples = np.fromiter(self._samples, dtype=np.float64)
+        p50, p90, p95, p99 = np.percentile(samples, [50, 90, 95, 99])
+        edges = np.asarray(LATENCY_BUCKETS_MS + (np.inf,))
+        counts = np.bincount(np.searchsorted(edges, samples), minlength=len(edges))
+        return {
+            "count": self.count,
+            "window": len(samples),
+            "mean_ms": round(float(samples.mean()), 2),
+            "p50_ms": round(float(p50), 2),
+            "p90_ms": round(float(p90), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(samples.max()), 2),
+            "buckets": {
+                (f"le_{int(edge)}ms" if np.isfinite(edge) else "inf"): int(count)
+                for edge, count in zip(edges, counts)
+            },
+        }
+
+
+class StageTimer:
+    """Wall-clock time of each stage of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def record(self, name: str, seconds: float):
+        self.timings[name] = seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, viewable in the browser's network panel."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items())
+
+
+class LatencyRecorder:
+    """Rolling histograms per stage, fed with StageTimer timings."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._stages: Dict[str, RollingHistogram] = {}
+
+    def observe(self, timings: Dict[str, float], prefix: Optional[str] = None):
+        for name, seconds in timings.items():
+            key = f"{prefix}.{name}" if prefix else name
+            histogram = self._stages.get(key)
+            if histogram is None:
+                histogram = self._stages[key] = RollingHistogram(self.window)
+            histogram.record(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {name: histogram.summary() for name, histogram in self._stages.items()}
@@ -0,0 +1,127 @@
+import io
+import json
+import struct
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+LOAD_TABLE = "documents_load"
+
+# COPY binary format: signature, flags and header extension length, then tuples, then -1
+_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_TRAILER = struct.pack("!h", -1)
+# pgvector's wire format: dimensions, an unused int16, then big-endian floats of the column's width
+_VECTOR_DTYPES = {"vector": ">f4", "halfvec": ">f2"}
+# jsonb's wire format is its text prefixed by a version byte
+_JSONB_VERSION = b"\x01"
+
+
+def _field(value: bytes) -> bytes:
+    return struct.pack("!i", len(value)) + value
+
+
+def copy_binary(
+    ids: List[str],
+    contents: List[str],
+    metadatas: List[Dict[str, Any]],
+    vectors: Sequence[Sequence[float]],
+    storage: str = "vector",
+) -> io.BytesIO:
+    """
+    Encodes (id, content, metadata, embedding) rows for COPY ... FROM STDIN
+    WITH (FORMAT binary). Binary vectors skip formatting and parsing
+    thousands of decimal floats per row, which dominates text-format COPY.
+    """
+    array = np.asarray(vectors, dtype=_VECTOR_DTYPES[storage])
+    vector_header = struct.pack("!hh", array.shape[1], 0) if array.ndim == 2 else b""
+    buffer = io.BytesIO()
+    buffer.write(_HEADER)
+    for row_id, content, metadata, vector in zip(ids, contents, metadatas, array):
+        buffer.write(struct.pack("!h", 4))
+        buffer.write(_field(uuid.UUID(row_id).bytes))
+        buffer.write(_field(content.encode("utf-8")))
+        buffer.write(_field(_JSONB_VERSION + json.dumps(metadata, default=str).encode("utf-8")))
+        buffer.write(_field(vector_header + vector.tobytes()))
+    buffer.write(_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+
+class PgvectorCopyLoader:
+    """
+    Bulk-loads rows into the documents table with binary COPY ... FROM STDIN
+    over a psycopg2 connection, all inside one transaction that commit()
+    ends, so readers see either none or all of a load.
+
+    With upsert=True rows are copied into a temporary table and merged with
+    INSERT ... ON CONFLICT (id) DO UPDATE, since COPY itself can't upsert;
+    with upsert=False they are copied straight into documents, which is
+    faster but fails on ids that already exist.
+
+    commit() can also rebuild the ANN index: it is dropped before the merge
+    and built once over the final table, which is much faster than updating
+    it row by row, but blocks queries on documents until the commit.
+    """
+
+    def __init__(self, conn, upsert: bool = True, storage: str = "vector"):
+        self.conn = conn
+        self.upsert = upsert
+        self.storage = storage
+        self.copied = 0
+        self.deleted = 0
+        if upsert:
+            with conn.cursor() as cur:
+                cur.execute(f"CREATE TEMP TABLE {LOAD_TABLE} (LIKE documents INCLUDING DEFAULTS) ON COMMIT DROP")
+
+    def copy(
+        self,
+        ids: List[str],
+        contents: List[str],
+        metadatas: List[Dict[str, Any]],
+        vectors: Sequence[Sequence[float]],
+    ):
+        """Streams one batch of rows to the server."""
+        if not ids:
+            return
+        table = LOAD_TABLE if self.upsert else "documents"
+        buffer = copy_binary(ids, contents, metadatas, vectors, self.storage)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(f"COPY {table} (id, content, metadata, embedding) FROM STDIN WITH (FORMAT binary)", buffer)
+        self.copied += len(ids)
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM documents WHERE id = ANY(%s::uuid[])", (list(ids),))
+            self.deleted += cur.rowcount
+
+    def delete_matching(self, metadata_filter: Dict[str, Any]):
+        """Deletes every row whose metadata contains the filter, e.g. {"exam": "ssc_cgl"}."""
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM documents WHERE metadata @> %s::jsonb", (json.dumps(metadata_filter),))
+            self.deleted += cur.rowcount
+
+    def delete_missing_key(self, key: str):
+        """Deletes every row whose metadata lacks `key`, e.g. rows ingested before exams existed."""
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM documents WHERE metadata IS NULL OR NOT metadata ? %s", (key,))
+            self.deleted += cur.rowcount
+
+    def commit(self, index_sql: Optional[str] = None):
+        """Merges the copied rows (in upsert mode), optionally rebuilds the ANN index, and commits."""
+        with self.conn.cursor() as cur:
+            if index_sql:
+                cur.execute("DROP INDEX IF EXISTS documents_embedding_idx")
+            if self.upsert:
+                cur.execute(f"""
+                    INSERT INTO documents (id, content, metadata, embedding)
+                    SELECT id, content, metadata, embedding FROM {LOAD_TABLE}
+                    ON CONFLICT (id) DO UPDATE
+                    SET content = EXCLUDED.content, metadata = EXCLUDED.metadata, embedding = EXCLUDED.embedding
+                """)
+            if index_sql:
+                cur.execute(index_sql)
+            cur.execute("ANALYZE documents")
+        self.conn.commit()
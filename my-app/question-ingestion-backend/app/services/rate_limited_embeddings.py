@@ -0,0 +1,96 @@
+import asyncio
+import itertools
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+import openai
+from langchain_core.embeddings import Embeddings
+
+from app.services.rate_limiter import RateLimiter
+from app.utils.logging_config import logger
+from app.utils.tokens import count_tokens
+
+T = TypeVar("T")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for throttling (429), server errors (5xx), timeouts and dropped connections."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (openai.APIConnectionError, TimeoutError, ConnectionError))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """The delay the server asked for in a Retry-After header, if any."""
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Sends every embeddings request through a shared RateLimiter (one request
+    plus the texts' tokens) and retries throttled and failed requests with
+    exponential backoff and jitter. A 429 pauses the limiter, so all threads
+    back off together rather than each hammering the API on its own.
+
+    A request only fails after max_retries retries, so batches are never
+    dropped silently: either the vectors come back or the caller gets the error.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        limiter: RateLimiter,
+        max_retries: int = 8,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.underlying = underlying
+        self.model = getattr(underlying, "model", None) or type(underlying).__name__
+        self.dimensions = getattr(underlying, "dimensions", None)
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = sum(count_tokens(text) for text in texts)
+        return self._call(lambda: self.underlying.embed_documents(texts), tokens)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(lambda: self.underlying.embed_query(text), count_tokens(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Waiting on the limiter blocks, so keep it off the event loop
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.limiter.stats(), "retries": self.retries}
+
+    def _call(self, request: Callable[[], T], tokens: int) -> T:
+        for attempt in itertools.count():
+            self.limiter.acquire(tokens)
+            try:
+                return request()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_after(e) or min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1)
+                if getattr(e, "status_code", None) == 429:
+                    self.limiter.pause(delay)
+                with self._lock:
+                    self.retries += 1
+                logger.warning(f"Embedding request failed ({type(e).__name__}: {e}); retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units a minute: holds up to a minute's worth and
+    refills continuously. Not thread-safe on its own; RateLimiter locks it.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (amounts above capacity wait for a full bucket)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+
+class RateLimiter:
+    """
+    Request and token budgets shared by every thread calling an API, e.g. an
+    embeddings model limited to N requests and M tokens per minute.
+
+    acquire() blocks until both budgets allow the call. pause() stops all
+    callers for a while, for when the API pushes back (HTTP 429) despite the
+    budgets, for instance because another process shares the same key.
+    A limit of 0 or less means unlimited.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests: Optional[TokenBucket] = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens: Optional[TokenBucket] = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited_seconds = 0.0
+        self.pauses = 0
+
+    def acquire(self, tokens: float = 0) -> float:
+        """Takes one request and `tokens` tokens from the budgets; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                    if bucket is not None:
+                        bucket.refill(now)
+                        wait = max(wait, bucket.wait_time(amount))
+                if wait <= 0:
+                    if self._requests is not None:
+                        self._requests.level -= 1
+                    if self._tokens is not None:
+                        self._tokens.level -= min(tokens, self._tokens.capacity)
+                    self.acquired += 1
+                    self.waited_seconds += waited
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float):
+        """Holds back every caller for at least `seconds`."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.pauses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests_per_minute": self.requests_per_minute or None,
+            "tokens_per_minute": self.tokens_per_minute or None,
+            "acquired": self.acquired,
+            "waited_seconds": round(self.waited_seconds, 2),
+            "pauses": self.pauses,
+        }
@@ -0,0 +1,227 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS, SupabaseVectorStore
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from app.services.bm25 import BM25Index
+from app.utils.hashing import chunk_id
+from app.utils.metadata import matches_filter
+
+# Number of chunks passed to the LLM
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+# Candidates fetched from each leg before fusion
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "10"))
+# Rank offset in reciprocal rank fusion; 60 is the value from the original RRF paper
+RRF_K = int(os.getenv("RRF_K", "60"))
+# FAISS applies metadata filters after the search, so filtered searches fetch this many times k first
+FAISS_FILTER_FETCH_MULTIPLIER = 10
+
+
+@dataclass
+class RetrievalResult:
+    documents: List[Document]
+    # Seconds spent in each retrieval leg, e.g. {"vector": 0.12, "lexical": 0.001}
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Cosine similarity to the query by chunk id, for chunks the vector leg returned
+    similarities: Dict[str, float] = field(default_factory=dict)
+
+
+# A vector search hit: the chunk and its cosine similarity to the query, if the store reports one
+VectorHit = Tuple[Document, Optional[float]]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Document]], k: int = RRF_K) -> List[Document]:
+    """
+    Merges several ranked lists into one, scoring each chunk by sum(1 / (k + rank)).
+
+    Chunks are matched across lists by content id, since vector and lexical
+    results are separate Document objects.
+    """
+    scores: Dict[str, float] = {}
+    docs_by_id: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            doc_id = chunk_id(doc)
+            docs_by_id.setdefault(doc_id, doc)
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return [docs_by_id[doc_id] for doc_id in sorted(scores, key=scores.get, reverse=True)]
+
+
+async def _timed(coro, timings: Dict[str, float], name: str):
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+def _faiss_similarity(vector_store: FAISS, score: float) -> Optional[float]:
+    """Cosine similarity from a FAISS score; embeddings are unit length, so both metrics convert."""
+    if vector_store.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+        return float(score)
+    if vector_store.distance_strategy == DistanceStrategy.EUCLIDEAN_DISTANCE:
+        # IndexFlatL2 reports squared distances: |a - b|^2 = 2 - 2cos
+        return 1.0 - float(score) / 2.0
+    return None
+
+
+def _supabase_search(vector_store: SupabaseVectorStore, query_embedding: List[float], k: int,
+                     metadata_filter: Optional[Dict[str, Any]]) -> List[VectorHit]:
+    """
+    Calls match_documents, which returns cosine similarity and applies the
+    filter in SQL. LangChain's own search leaves match_count at its default
+    and only limits the response, so it can never return more than that many
+    rows; here it is passed explicitly.
+    """
+    params = {**vector_store.match_args(query_embedding, metadata_filter), "match_count": k}
+    response = vector_store._client.rpc(vector_store.query_name, params).execute()
+    return [
+        (Document(page_content=row["content"], metadata=row.get("metadata") or {}), row.get("similarity"))
+        for row in response.data
+        if row.get("content")
+    ]
+
+
+async def _vector_search(vector_store: VectorStore, query_embedding: List[float], k: int,
+                         metadata_filter: Optional[Dict[str, Any]]) -> List[VectorHit]:
+    metadata_filter = metadata_filter or None
+    if isinstance(vector_store, FAISS):
+        hits = await vector_store.asimilarity_search_with_score_by_vector(
+            query_embedding, k=k, filter=metadata_filter, fetch_k=k * FAISS_FILTER_FETCH_MULTIPLIER
+        )
+        return [(doc, _faiss_similarity(vector_store, score)) for doc, score in hits]
+    if isinstance(vector_store, SupabaseVectorStore):
+        # There is no async client, so this runs in the (bounded) default executor
+        return await asyncio.to_thread(_supabase_search, vector_store, query_embedding, k, metadata_filter)
+    docs = await vector_store.asimilarity_search_by_vector(query_embedding, k=k, filter=metadata_filter)
+    return [(doc, None) for doc in docs]
+
+
+def _similarities(hits: List[VectorHit]) -> Dict[str, float]:
+    return {chunk_id(doc): similarity for doc, similarity in hits if similarity is not None}
+
+
+async def hybrid_search(
+    vector_store: VectorStore,
+    lexical_index: Optional[BM25Index],
+    query: str,
+    query_embedding: List[float],
+    k: int = RETRIEVAL_K,
+    candidates: int = RETRIEVAL_CANDIDATES,
+    metadata_filter: Optional[Dict[str, Any]] = None,
+) -> RetrievalResult:
+    """
+    Runs vector and BM25 search concurrently and fuses them with RRF.
+
+    Without a lexical index this is a plain vector search for k chunks.
+    metadata_filter (e.g. {"topic": "quant_topics"}) restricts both legs to
+    chunks whose metadata has those values.
+    """
+    timings: Dict[str, float] = {}
+    if lexical_index is None:
+        hits = await _timed(_vector_search(vector_store, query_embedding, k, metadata_filter), timings, "vector")
+        return RetrievalResult(documents=[doc for doc, _ in hits], timings=timings, similarities=_similarities(hits))
+
+    vector_hits, lexical_hits = await asyncio.gather(
+        _timed(_vector_search(vector_store, query_embedding, candidates, metadata_filter), timings, "vector"),
+        _timed(asyncio.to_thread(lexical_index.search, query, candidates, metadata_filter), timings, "lexical"),
+    )
+    start = time.perf_counter()
+    fused = reciprocal_rank_fusion([[doc for doc, _ in vector_hits], [doc for doc, _ in lexical_hits]])[:k]
+    timings["fusion"] = time.perf_counter() - start
+    return RetrievalResult(documents=fused, timings=timings, similarities=_similarities(vector_hits))
+
+
+def _faiss_batch_search(
+    vector_store: FAISS,
+    query_embeddings: List[List[float]],
+    k: int,
+    metadata_filter: Optional[Dict[str, Any]],
+) -> List[List[VectorHit]]:
+    """One index.search call for every query, mapped back to docstore documents."""
+    vectors = np.asarray(query_embeddings, dtype=np.float32)
+    if vector_store._normalize_L2:
+        faiss.normalize_L2(vectors)
+    fetch_k = k * FAISS_FILTER_FETCH_MULTIPLIER if metadata_filter else k
+    scores, indices = vector_store.index.search(vectors, fetch_k)
+
+    results = []
+    for row_scores, row in zip(scores, indices):
+        hits = []
+        for score, i in zip(row_scores, row):
+            if i == -1:
+                continue
+            doc = vector_store.docstore.search(vector_store.index_to_docstore_id[i])
+            if matches_filter(doc.metadata, metadata_filter):
+                hits.append((doc, _faiss_similarity(vector_store, score)))
+                if len(hits) == k:
+                    break
+        results.append(hits)
+    return results
+
+
+async def _batch_vector_search(
+    vector_store: VectorStore,
+    query_embeddings: List[List[float]],
+    k: int,
+    metadata_filter: Optional[Dict[str, Any]],
+) -> List[List[VectorHit]]:
+    if isinstance(vector_store, FAISS):
+        return await asyncio.to_thread(_faiss_batch_search, vector_store, query_embeddings, k, metadata_filter)
+    # pgvector has no multi-query search; issue the queries concurrently instead
+    return list(await asyncio.gather(*(
+        _vector_search(vector_store, embedding, k, metadata_filter) for embedding in query_embeddings
+    )))
+
+
+async def batch_hybrid_search(
+    vector_store: VectorStore,
+    lexical_index: Optional[BM25Index],
+    queries: List[str],
+    query_embeddings: List[List[float]],
+    k: int = RETRIEVAL_K,
+    candidates: int = RETRIEVAL_CANDIDATES,
+    metadata_filter: Optional[Dict[str, Any]] = None,
+) -> List[RetrievalResult]:
+    """
+    hybrid_search for many queries at once, in query order.
+
+    FAISS answers all queries with a single vectorized index search and the
+    BM25 leg scores them in one worker thread. Timings are for the whole
+    batch and shared by every result.
+    """
+    timings: Dict[str, float] = {}
+    if lexical_index is None:
+        vector_results = await _timed(
+            _batch_vector_search(vector_store, query_embeddings, k, metadata_filter), timings, "vector"
+        )
+        return [
+            RetrievalResult(documents=[doc for doc, _ in hits], timings=timings, similarities=_similarities(hits))
+            for hits in vector_results
+        ]
+
+    vector_results, lexical_results = await asyncio.gather(
+        _timed(_batch_vector_search(vector_store, query_embeddings, candidates, metadata_filter), timings, "vector"),
+        _timed(
+            asyncio.to_thread(lambda: [lexical_index.search(query, candidates, metadata_filter) for query in queries]),
+            timings, "lexical"
+        ),
+    )
+    start = time.perf_counter()
+    fused = [
+        reciprocal_rank_fusion([[doc for doc, _ in vector_hits], [doc for doc, _ in lexical_hits]])[:k]
+        for vector_hits, lexical_hits in zip(vector_results, lexical_results)
+    ]
+    timings["fusion"] = time.perf_counter() - start
+    return [
+        RetrievalResult(documents=docs, timings=timings, similarities=_similarities(vector_hits))
+        for docs, vector_hits in zip(fused, vector_results)
+    ]
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.utils.logging_config import logger
+
+# Conversations idle for longer than this are forgotten
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+# "memory" (per process) or "sqlite" (shared by the workers of one host, survives restarts)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "./data/sessions.sqlite3")
+# Most conversations kept; the least recently used go first
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+
+
+@dataclass
+class Conversation:
+    session_id: str
+    # Rolling summary of the turns that no longer fit in `turns`
+    summary: str = ""
+    # Most recent turns, oldest first
+    turns: List[Turn] = field(default_factory=list)
+    # Total turns in the conversation, including the summarized ones
+    turn_count: int = 0
+    updated_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str) -> "Conversation":
+        values = json.loads(data)
+        values["turns"] = [Turn(**turn) for turn in values.get("turns", [])]
+        return cls(**values)
+
+
+class SessionStore(ABC):
+    """
+    Where conversations live between requests. Implementations expire a
+    conversation ttl_seconds after its last save.
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Conversation]:
+        """The conversation, or None if it is unknown or expired."""
+
+    @abstractmethod
+    async def save(self, conversation: Conversation):
+        """Stores the conversation and restarts its ttl."""
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        """Forgets the conversation; unknown ids are ignored."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the health snapshot."""
+
+
+class InMemorySessionStore(SessionStore):
+    """Conversations in a dict in LRU order, expired lazily on access and on save."""
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX_SESSIONS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+
+    async def get(self, session_id: str) -> Optional[Conversation]:
+        conversation = self._conversations.get(session_id)
+        if conversation is None:
+            return None
+        if time.time() - conversation.updated_at > self.ttl_seconds:
+            del self._conversations[session_id]
+            self.expired += 1
+            return None
+        # Callers modify their copy and save it back
+        return Conversation.from_json(conversation.to_json())
+
+    async def save(self, conversation: Conversation):
+        conversation.updated_at = time.time()
+        self._conversations[conversation.session_id] = Conversation.from_json(conversation.to_json())
+        self._conversations.move_to_end(conversation.session_id)
+        self._expire(conversation.updated_at)
+
+    async def delete(self, session_id: str):
+        self._conversations.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": "memory",
+            "sessions": len(self._conversations),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def _expire(self, now: float):
+        # Saves keep the dict in updated_at order, so expired conversations are at the front
+        while self._conversations:
+            session_id, oldest = next(iter(self._conversations.items()))
+            if now - oldest.updated_at > self.ttl_seconds:
+                self.expired += 1
+            elif len(self._conversations) > self.max_sessions:
+                self.evicted += 1
+            else:
+                break
+            del self._conversations[session_id]
+
+
+class SQLiteSessionStore(SessionStore):
+    """Conversations as JSON rows in SQLite, so every worker on the host sees them."""
+
+    def __init__(
+        self,
+        db_path: str = SESSION_DB_PATH,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+              session_id TEXT PRIMARY KEY,
+              conversation TEXT NOT NULL,
+              updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at_idx ON sessions (updated_at)")
+        self._conn.commit()
+
+    async def get(self, session_id: str) -> Optional[Conversation]:
+        # SQLite access is blocking, so keep it off the event loop
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def save(self, conversation: Conversation):
+        conversation.updated_at = time.time()
+        await asyncio.to_thread(self._save, conversation)
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._execute, "DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {
+            "store": "sqlite",
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "path": self._db_path,
+        }
+
+    def _get(self, session_id: str) -> Optional[Conversation]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT conversation FROM sessions WHERE session_id = ? AND updated_at > ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+        return Conversation.from_json(row[0]) if row else None
+
+    def _save(self, conversation: Conversation):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, conversation, updated_at) VALUES (?, ?, ?)",
+                (conversation.session_id, conversation.to_json(), conversation.updated_at),
+            )
+            self._conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (time.time() - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+            self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+
+def create_session_store() -> SessionStore:
+    """The session store selected by SESSION_STORE."""
+    if SESSION_STORE == "sqlite":
+        return SQLiteSessionStore()
+    if SESSION_STORE != "memory":
+        logger.warning(f"Unknown SESSION_STORE {SESSION_STORE!r}; keeping sessions in memory")
+    return InMemorySessionStore()
@@ -0,0 +1,58 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation don't change what is being asked."""
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+def query_key(query: str, metadata_filter: Optional[Dict[str, Any]] = None, *extra: Hashable) -> Tuple:
+    return (normalize_query(query), json.dumps(metadata_filter or {}, sort_keys=True), *extra)
+
+
+class SingleFlight:
+    """
+    Shares one in-flight computation between concurrent callers with the same key.
+
+    The first caller for a key starts the work as its own task; callers
+    arriving before it finishes await the same task instead of starting
+    another. The task is shielded, so a caller that disconnects doesn't
+    cancel the work for the others. Nothing is kept after it finishes.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Returns (result, whether this caller joined an existing computation)."""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(work())
+        self._inflight[key] = task
+        self.leaders += 1
+        task.add_done_callback(lambda finished: self._finish(key, finished))
+        return await asyncio.shield(task), False
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark a failure as retrieved even if every caller went away
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        callers = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "computations": self.leaders,
+            "coalesced_callers": self.coalesced,
+            "coalesced_rate": self.coalesced / callers if callers else None,
+        }
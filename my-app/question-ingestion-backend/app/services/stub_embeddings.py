@@ -0,0 +1,50 @@
+import random
+import time
+import zlib
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+class StubRateLimitError(Exception):
+    """What StubEmbeddings raises to imitate an HTTP 429 from the API."""
+
+    status_code = 429
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Stands in for a remote embeddings API in dry runs: every request sleeps
+    for latency_ms (plus a little per text), fails with a 429 with probability
+    error_rate, and returns cheap one-hot vectors. Sleeping releases the GIL,
+    so concurrent requests overlap the way real network calls do, which makes
+    it useful for measuring how ingestion throughput scales with concurrency.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = 384,
+        latency_ms: float = 300,
+        per_text_ms: float = 0.5,
+        error_rate: float = 0.0,
+        model: str = "stub",
+    ):
+        self.model = model
+        self.dimensions = dimensions
+        self.latency = latency_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.error_rate = error_rate
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency + self.per_text * len(texts))
+        if random.random() < self.error_rate:
+            raise StubRateLimitError("Rate limit reached (simulated)")
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dimensions
+            vector[zlib.crc32(text.encode("utf-8")) % self.dimensions] = 1.0
+            vectors.append(vector)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
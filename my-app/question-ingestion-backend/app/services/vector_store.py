@@ -0,0 +1,159 @@
+import asyncio
+import itertools
+import os
+import time
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from app.services.bm25 import BM25Index
+from app.utils.hashing import chunk_id
+from app.utils.logging_config import logger
+
+# How often the process-wide vector store is rebuilt in the background (seconds).
+# 0 disables periodic refresh; the store is then only rebuilt on demand.
+VECTOR_STORE_REFRESH_SECONDS = float(os.getenv("VECTOR_STORE_REFRESH_SECONDS", "0"))
+
+# Build a BM25 index next to the vector store for hybrid retrieval
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+
+# Shared by every manager, so a generation number identifies one build across all corpora
+_generations = itertools.count(1)
+
+
+class VectorStoreManager:
+    """
+    Holds a single vector store for the whole process.
+
+    The store is built once (normally from the FastAPI lifespan), handed out to
+    every request, and rebuilt either periodically or through refresh().
+    Requests keep using the previous store while a rebuild is in progress.
+
+    corpus_loader returns every chunk behind a store (or None if that is not
+    possible); when it does, the manager also keeps their content ids and,
+    with HYBRID_RETRIEVAL, a BM25 index over them.
+    """
+
+    def __init__(
+        self,
+        builder: Callable[[], VectorStore],
+        refresh_interval: float = VECTOR_STORE_REFRESH_SECONDS,
+        corpus_loader: Optional[Callable[[VectorStore], Optional[List[Document]]]] = None,
+    ):
+        self._builder = builder
+        self._corpus_loader = corpus_loader or load_docstore_documents
+        self.refresh_interval = refresh_interval
+        self._store: Optional[VectorStore] = None
+        self._built_at: Optional[float] = None
+        self._build_seconds: Optional[float] = None
+        self._last_error: Optional[str] = None
+        # Changes on every rebuild so caches can tell which store their results came from;
+        # unique within the process, even across managers
+        self.generation = 0
+        # Content ids of every chunk in the store, when the corpus can be enumerated
+        self.chunk_ids: Optional[FrozenSet[str]] = None
+        # Lexical index over the same chunks, for hybrid retrieval
+        self.lexical_index: Optional[BM25Index] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Build the store and start the periodic refresh task, if configured."""
+        try:
+            await self.refresh()
+        except Exception:
+            # Don't keep the app from starting; get() will retry lazily.
+            logger.exception("Initial vector store build failed")
+        self.start_refresh()
+
+    def start_refresh(self):
+        """Start the periodic refresh task, if configured and not already running."""
+        if self.refresh_interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Stop the periodic refresh task."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def get(self) -> VectorStore:
+        """Return the current store, building it first if it was never built or was invalidated."""
+        store = self._store
+        if store is not None:
+            return store
+
+        async with self._lock:
+            if self._store is None:
+                await self._build()
+            return self._store
+
+    async def refresh(self) -> VectorStore:
+        """Rebuild the store and swap it in once the new one is ready."""
+        async with self._lock:
+            await self._build()
+            return self._store
+
+    def invalidate(self):
+        """Drop the current store; the next get() rebuilds it."""
+        self._store = None
+        self._built_at = None
+        logger.info("Vector store invalidated")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self._store is not None,
+            "store_type": type(self._store).__name__ if self._store is not None else None,
+            "generation": self.generation,
+            "chunk_count": len(self.chunk_ids) if self.chunk_ids is not None else None,
+            "lexical_index": self.lexical_index is not None,
+            "built_at": self._built_at,
+            "age_seconds": time.time() - self._built_at if self._built_at else None,
+            "build_seconds": self._build_seconds,
+            "refresh_interval_seconds": self.refresh_interval,
+            "last_error": self._last_error,
+        }
+
+    async def _build(self):
+        start_time = time.perf_counter()
+        try:
+            # Builders make blocking network calls (embeddings, Supabase)
+            store = await asyncio.to_thread(self._builder)
+            documents = await asyncio.to_thread(self._corpus_loader, store)
+            chunk_ids = frozenset(chunk_id(doc) for doc in documents) if documents is not None else None
+            lexical_index = None
+            if HYBRID_RETRIEVAL and documents:
+                lexical_index = await asyncio.to_thread(BM25Index, documents)
+        except Exception as e:
+            self._last_error = str(e)
+            raise
+
+        self._store = store
+        self.chunk_ids = chunk_ids
+        self.lexical_index = lexical_index
+        self.generation = next(_generations)
+        self._built_at = time.time()
+        self._build_seconds = time.perf_counter() - start_time
+        self._last_error = None
+        logger.info(f"Vector store built ({type(store).__name__}) in {self._build_seconds:.2f}s")
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Periodic vector store refresh failed; keeping previous store")
+
+
+def load_docstore_documents(store: VectorStore) -> Optional[List[Document]]:
+    """All chunks held in an in-memory docstore (FAISS); None for stores that don't have one."""
+    docs = getattr(getattr(store, "docstore", None), "_dict", None)
+    if docs is None:
+        return None
+    return list(docs.values())
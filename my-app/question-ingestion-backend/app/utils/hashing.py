@@ -0,0 +1,49 @@
+import hashlib
+import json
+from typing import Iterable
+
+from langchain_core.documents import Document
+
+
+def sha256_text(text: str) -> str:
+    """Hex sha256 of a UTF-8 string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(doc: Document) -> str:
+    """
+    Stable identifier for a chunk, derived from its content.
+
+    Used wherever chunks coming back from different stores (FAISS, Supabase)
+    need to be compared, since neither returns a common row id.
+    """
+    return sha256_text(doc.page_content)[:32]
+
+
+def corpus_fingerprint(documents: Iterable[Document], model_name: str) -> str:
+    """Hash of every chunk text and metadata (in order) plus the embedding model that indexes them."""
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    for doc in documents:
+        digest.update(b"\0")
+        digest.update(doc.page_content.encode("utf-8"))
+        # Metadata is filterable at query time, so changing it must rebuild the index too
+        digest.update(b"\0")
+        digest.update(json.dumps(doc.metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def document_hash(doc: Document) -> str:
+    """Hash of one chunk's text and metadata; changes whenever the stored row would."""
+    digest = hashlib.sha256(doc.page_content.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(doc.metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def file_sha256(path, block_size: int = 1 << 20) -> str:
+    """Hex sha256 of a file, read in blocks so large PDFs aren't loaded whole."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
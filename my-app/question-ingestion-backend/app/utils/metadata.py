@@ -0,0 +1,14 @@
+from typing import Any, Dict, Optional
+
+
+def matches_filter(metadata: Optional[Dict[str, Any]], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    True if every key in the filter has the same value in the metadata.
+
+    Mirrors `metadata @> filter` in match_documents for flat filters, so
+    in-process stores and indexes select the same chunks as pgvector.
+    """
+    if not metadata_filter:
+        return True
+    metadata = metadata or {}
+    return all(metadata.get(key) == value for key, value in metadata_filter.items())
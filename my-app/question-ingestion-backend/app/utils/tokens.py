@@ -0,0 +1,39 @@
+import os
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+from app.utils.logging_config import logger
+
+# Tokenizer of the answering model (gpt-4-turbo)
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+# Rough English average, used when the tokenizer files can't be loaded
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        # tiktoken downloads its BPE files on first use, which fails offline
+        logger.warning("Could not load tiktoken encoding %s; estimating token counts from length", TOKEN_ENCODING)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in text for the answering model (an estimate if tiktoken is unavailable)."""
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """The first max_tokens tokens of text (by the same estimate as count_tokens without tiktoken)."""
+    encoding = _encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])